@@ -0,0 +1,144 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(NUMBER_OF_POSTS=3, COMMENTS_PER_PAGE=2)
+class ApiTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author,
+                text=f'Пост {i}',
+                group=cls.group if i % 2 else None,
+            ) for i in range(5)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.posts[0], author=cls.reader, text=f'Комментарий {i}'
+            ) for i in range(3)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def collect(self, url, client=None, **params):
+        """Проходит ленту по ссылкам next и возвращает все записи."""
+        client = client or self.client
+        response = client.get(url, params)
+        results = []
+        while True:
+            self.assertEqual(response.status_code, 200)
+            data = response.json()
+            results.extend(data['results'])
+            if data['next'] is None:
+                return results
+            response = client.get(data['next'])
+
+    def test_feeds_are_paginated_by_cursor(self):
+        """Проверяем, что ленты листаются курсором до конца."""
+        cases = (
+            (reverse('api:index'), self.posts[::-1]),
+            (reverse('api:group', args=[self.group.slug]),
+             [post for post in self.posts[::-1] if post.group_id]),
+            (reverse('api:profile', args=[self.author.username]),
+             self.posts[::-1]),
+        )
+        for url, posts in cases:
+            with self.subTest(url=url):
+                results = self.collect(url, fields='id')
+                self.assertEqual(
+                    [item['id'] for item in results],
+                    [post.pk for post in posts],
+                )
+
+    def test_fields_select_columns_without_models(self):
+        """Проверяем, что ?fields= ограничивает поля и модели не
+        создаются."""
+        with mock.patch.object(Post, 'from_db') as from_db:
+            response = self.client.get(
+                reverse('api:index'), {'fields': 'text,author'}
+            )
+        from_db.assert_not_called()
+        self.assertEqual(
+            response.json()['results'][0],
+            {'text': 'Пост 4', 'author': 'author'},
+        )
+        response = self.client.get(
+            reverse('api:post_detail', args=[self.posts[1].pk])
+        )
+        self.assertEqual(response.json()['group'], self.group.slug)
+        self.assertIsNone(response.json()['image'])
+
+    def test_errors_are_json(self):
+        """Проверяем ответы на неизвестное поле и отсутствующие объекты."""
+        cases = (
+            (reverse('api:index'), {'fields': 'password'}, 400),
+            (reverse('api:group', args=['missing']), {}, 404),
+            (reverse('api:post_detail', args=[0]), {}, 404),
+            (reverse('api:post_comments', args=[0]), {}, 404),
+            (reverse('api:follow_index'), {}, 401),
+        )
+        for url, params, status in cases:
+            with self.subTest(url=url):
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status)
+                self.assertIn('detail', response.json())
+
+    def test_comments_in_written_order(self):
+        """Проверяем, что комментарии отдаются в порядке написания."""
+        results = self.collect(
+            reverse('api:post_comments', args=[self.posts[0].pk])
+        )
+        self.assertEqual(
+            [item['text'] for item in results],
+            [comment.text for comment in self.comments],
+        )
+
+    def test_follow_feed(self):
+        """Проверяем ленту подписок с разложенными и читаемыми при выдаче
+        постами."""
+        client = Client()
+        client.force_login(self.reader)
+        for max_followers in (100, 0):
+            with self.subTest(max_followers=max_followers):
+                with override_settings(
+                    TIMELINE_FANOUT_MAX_FOLLOWERS=max_followers
+                ):
+                    follow = Follow.objects.create(
+                        user=self.reader, author=self.author
+                    )
+                    results = self.collect(
+                        reverse('api:follow_index'), client, fields='id'
+                    )
+                    follow.delete()
+                self.assertEqual(
+                    [item['id'] for item in results],
+                    [post.pk for post in self.posts[::-1]],
+                )
+
+    def test_unchanged_feed_answers_304(self):
+        """Проверяем условный GET и сброс ETag новым комментарием."""
+        url = reverse('api:index')
+        etag = self.client.get(url)['ETag']
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(
+            post=self.posts[2], author=self.reader, text='Новый'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
@@ -0,0 +1,199 @@
+"""JSON API для чтения лент, постов и комментариев.
+
+Строки выбираются через .values(), без создания моделей, и сразу
+превращаются в словари ответа. ?fields=id,text ограничивает набор полей
+(а с ним и колонки в SELECT), листание курсором такое же, как у HTML-лент
+(?after=/?before=), а ETag считают те же валидаторы, что и у страниц.
+"""
+from http import HTTPStatus
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse
+from django.utils.http import urlencode
+from django.views.decorators.http import condition, require_safe
+
+from posts import cache, timeline
+from posts.models import Comment, Group, Post, User
+from posts.paginator import CursorPaginator
+from posts.views import (group_posts_etag, index_etag, latest_changes,
+                         post_detail_etag, profile_etag)
+
+# Поле ответа -> выражение для .values().
+POST_FIELDS = {
+    'id': 'id',
+    'text': 'text',
+    'pub_date': 'pub_date',
+    'author': 'author__username',
+    'group': 'group__slug',
+    'image': 'image',
+    'comments_count': 'comments_count',
+    'last_comment_at': 'last_comment_at',
+}
+COMMENT_FIELDS = {
+    'id': 'id',
+    'post': 'post',
+    'author': 'author__username',
+    'text': 'text',
+    'created': 'created',
+}
+POST_ORDERING = ('-pub_date', '-id')
+COMMENT_ORDERING = ('created', 'id')
+
+
+def json_response(data, status=HTTPStatus.OK):
+    return JsonResponse(
+        data,
+        status=status,
+        encoder=DjangoJSONEncoder,
+        json_dumps_params={'ensure_ascii': False, 'separators': (',', ':')},
+    )
+
+
+def error(detail, status):
+    return json_response({'detail': detail}, status=status)
+
+
+def unknown_fields(available):
+    return error(
+        'Неизвестное поле в fields. Доступны: ' + ', '.join(available),
+        HTTPStatus.BAD_REQUEST,
+    )
+
+
+def requested_fields(request, available):
+    """Поля из ?fields= (по умолчанию все) или None, если есть неизвестные."""
+    raw = request.GET.get('fields')
+    if not raw:
+        return list(available)
+    names = [name.strip() for name in raw.split(',') if name.strip()]
+    if not names or any(name not in available for name in names):
+        return None
+    return list(dict.fromkeys(names))
+
+
+def lookups_for(names, available, ordering=()):
+    """Выражения для .values(): запрошенные поля и ключ сортировки."""
+    lookups = [available[name] for name in names]
+    for field in ordering:
+        if field.lstrip('-') not in lookups:
+            lookups.append(field.lstrip('-'))
+    return lookups
+
+
+def serialize(row, names, available):
+    item = {name: row[available[name]] for name in names}
+    if 'image' in item:
+        storage = Post._meta.get_field('image').storage
+        item['image'] = storage.url(item['image']) if item['image'] else None
+    return item
+
+
+def page_link(request, param, cursor):
+    if cursor is None:
+        return None
+    query = request.GET.copy()
+    query.pop('after', None)
+    query.pop('before', None)
+    query[param] = cursor
+    return f'{request.path}?{urlencode(sorted(query.items()))}'
+
+
+def page_response(request, rows, available, ordering, per_page):
+    """Страница rows (QuerySet или лента с values()) в формате API."""
+    names = requested_fields(request, available)
+    if names is None:
+        return unknown_fields(available)
+    rows = rows.values(*lookups_for(names, available, ordering))
+    page = CursorPaginator(rows, per_page, ordering).get_page(
+        after=request.GET.get('after'),
+        before=request.GET.get('before'),
+    )
+    return json_response({
+        'results': [serialize(row, names, available) for row in page],
+        'next': page_link(request, 'after', page.next_cursor),
+        'previous': page_link(request, 'before', page.previous_cursor),
+    })
+
+
+def follow_index_etag(request):
+    if not request.user.is_authenticated:
+        return None
+    return cache.page_etag(
+        request, latest_changes(),
+        cache.ALL_POSTS, cache.ALL_COMMENTS,
+        cache.follow_scope(request.user.pk),
+    )
+
+
+@require_safe
+@condition(etag_func=index_etag)
+def index(request):
+    return page_response(
+        request, Post.objects.all(), POST_FIELDS, POST_ORDERING,
+        settings.NUMBER_OF_POSTS,
+    )
+
+
+@require_safe
+@condition(etag_func=group_posts_etag)
+def group_posts(request, slug):
+    group_id = Group.objects.filter(slug=slug).values_list(
+        'pk', flat=True
+    ).first()
+    if group_id is None:
+        return error('Группа не найдена.', HTTPStatus.NOT_FOUND)
+    return page_response(
+        request, Post.objects.filter(group_id=group_id), POST_FIELDS,
+        POST_ORDERING, settings.NUMBER_OF_POSTS,
+    )
+
+
+@require_safe
+@condition(etag_func=profile_etag)
+def profile(request, username):
+    author_id = User.objects.filter(username=username).values_list(
+        'pk', flat=True
+    ).first()
+    if author_id is None:
+        return error('Автор не найден.', HTTPStatus.NOT_FOUND)
+    return page_response(
+        request, Post.objects.filter(author_id=author_id), POST_FIELDS,
+        POST_ORDERING, settings.NUMBER_OF_POSTS,
+    )
+
+
+@require_safe
+@condition(etag_func=follow_index_etag)
+def follow_index(request):
+    if not request.user.is_authenticated:
+        return error('Нужна авторизация.', HTTPStatus.UNAUTHORIZED)
+    return page_response(
+        request, timeline.FollowFeed(request.user), POST_FIELDS,
+        POST_ORDERING, settings.NUMBER_OF_POSTS,
+    )
+
+
+@require_safe
+@condition(etag_func=post_detail_etag)
+def post_detail(request, post_id):
+    names = requested_fields(request, POST_FIELDS)
+    if names is None:
+        return unknown_fields(POST_FIELDS)
+    row = Post.objects.filter(pk=post_id).values(
+        *lookups_for(names, POST_FIELDS)
+    ).first()
+    if row is None:
+        return error('Пост не найден.', HTTPStatus.NOT_FOUND)
+    return json_response(serialize(row, names, POST_FIELDS))
+
+
+@require_safe
+@condition(etag_func=post_detail_etag)
+def post_comments(request, post_id):
+    if not Post.objects.filter(pk=post_id).exists():
+        return error('Пост не найден.', HTTPStatus.NOT_FOUND)
+    return page_response(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        COMMENT_ORDERING, settings.COMMENTS_PER_PAGE,
+    )
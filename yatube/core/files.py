@@ -0,0 +1,204 @@
+"""Отдача файлов с диска без фреймворка статики.
+
+serve_file поддерживает условные запросы (ETag, If-Modified-Since), один
+диапазон Range и потоковую отдачу крупными блоками, а для статики —
+заранее сжатые копии .br/.gz по Accept-Encoding. Если задан заголовок
+передачи (X-Accel-Redirect для nginx, X-Sendfile для Apache/lighttpd),
+Django проверяет путь и условные заголовки, а сами байты отдаёт прокси.
+"""
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, parse_http_date_safe
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+# Кодировки заранее сжатых копий в порядке предпочтения.
+PRECOMPRESSED = (('br', '.br'), ('gzip', '.gz'))
+
+
+class UnsatisfiableRange(Exception):
+    pass
+
+
+class ChunkedFileResponse(FileResponse):
+    block_size = 64 * 1024
+
+
+class FileRange:
+    """Файл, из которого читается не больше length байт от start."""
+
+    def __init__(self, file, start, length):
+        file.seek(start)
+        self.file = file
+        self.remaining = length
+
+    def read(self, size=-1):
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.file.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def close(self):
+        self.file.close()
+
+
+def parse_range(header, size):
+    """(start, end) включительно для заголовка Range или None.
+
+    Несколько диапазонов и непонятный синтаксис игнорируются — тогда
+    отдаётся весь файл, как разрешает RFC 7233.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    if size == 0:
+        # В пустом файле нет ни одного байта, который можно отдать.
+        raise UnsatisfiableRange
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            raise UnsatisfiableRange
+        return max(0, size - length), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size or start > end:
+        raise UnsatisfiableRange
+    return start, end
+
+
+def accepted_encodings(request):
+    """Кодировки из Accept-Encoding, которые клиент не запретил (q=0)."""
+    accepted = set()
+    for item in request.META.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = params.strip()
+        if quality.startswith('q='):
+            try:
+                if float(quality[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        if coding:
+            accepted.add(coding.strip().lower())
+    return accepted
+
+
+def precompressed_suffix(request, fullpath):
+    """(кодировка, суффикс) лучшей сжатой копии файла или (None, '')."""
+    accepted = accepted_encodings(request)
+    for encoding, suffix in PRECOMPRESSED:
+        if encoding in accepted and os.path.isfile(fullpath + suffix):
+            return encoding, suffix
+    return None, ''
+
+
+def if_range_passes(request, etag, last_modified):
+    value = request.META.get('HTTP_IF_RANGE')
+    if not value:
+        return True
+    if value.startswith('"'):
+        return value == etag
+    if value.startswith('W/'):
+        return False
+    return parse_http_date_safe(value) == last_modified
+
+
+def _resolve(path, document_root):
+    path = posixpath.normpath(path).lstrip('/')
+    try:
+        fullpath = safe_join(document_root, path)
+        info = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError, ValueError):
+        raise Http404('Файл не найден')
+    if not stat.S_ISREG(info.st_mode):
+        raise Http404('Файл не найден')
+    return path, fullpath, info
+
+
+def serve_file(request, path, document_root, cache_control='',
+               offload_header=None, offload_prefix='', precompressed=False):
+    """Отдаёт файл path из document_root.
+
+    offload_header — 'X-Accel-Redirect' (значение — offload_prefix и путь,
+    для internal location в nginx) или 'X-Sendfile' (абсолютный путь).
+    precompressed=True разрешает отдавать соседние .br/.gz копии.
+    """
+    path, fullpath, info = _resolve(path, document_root)
+    content_type, encoding = mimetypes.guess_type(fullpath)
+    if encoding or not content_type:
+        content_type = 'application/octet-stream'
+    headers = HttpResponse(content_type=content_type)
+    if precompressed:
+        headers['Vary'] = 'Accept-Encoding'
+        encoding, suffix = precompressed_suffix(request, fullpath)
+        if encoding:
+            headers['Content-Encoding'] = encoding
+            path += suffix
+            fullpath += suffix
+            info = os.stat(fullpath)
+
+    last_modified = int(info.st_mtime)
+    etag = f'"{info.st_size:x}-{info.st_mtime_ns:x}"'
+    headers['ETag'] = etag
+    headers['Last-Modified'] = http_date(last_modified)
+    headers['Accept-Ranges'] = 'bytes'
+    if cache_control:
+        headers['Cache-Control'] = cache_control
+    conditional = get_conditional_response(
+        request, etag=etag, last_modified=last_modified, response=headers
+    )
+    if conditional is not headers:
+        return conditional
+
+    if offload_header:
+        response = HttpResponse(content_type=content_type)
+        response[offload_header] = (
+            offload_prefix + quote(path)
+            if offload_header.lower() == 'x-accel-redirect'
+            else fullpath
+        )
+    else:
+        response = _file_response(
+            request, fullpath, info.st_size, content_type,
+            etag, last_modified,
+        )
+    for header, value in headers.items():
+        response[header] = value
+    return response
+
+
+def _file_response(request, fullpath, size, content_type, etag,
+                   last_modified):
+    byte_range = None
+    header = request.META.get('HTTP_RANGE')
+    if header and if_range_passes(request, etag, last_modified):
+        try:
+            byte_range = parse_range(header, size)
+        except UnsatisfiableRange:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{size}'
+            return response
+    file = open(fullpath, 'rb')
+    if byte_range is None:
+        response = ChunkedFileResponse(file, content_type=content_type)
+        response['Content-Length'] = size
+        return response
+    start, end = byte_range
+    response = ChunkedFileResponse(
+        FileRange(file, start, end - start + 1),
+        status=206,
+        content_type=content_type,
+    )
+    response['Content-Length'] = end - start + 1
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
@@ -0,0 +1,114 @@
+"""Бюджеты запросов к базе для тестов представлений.
+
+query_budget — контекстный менеджер и декоратор: падает, если внутри
+выполнено больше запросов, чем разрешено. Сообщение об ошибке
+группирует запросы по нормализованному тексту (литералы заменены на ?,
+списки IN свёрнуты), поэтому N+1 видно сразу: один и тот же SELECT
+с числом повторов рядом.
+"""
+import re
+from collections import Counter
+from contextlib import ContextDecorator
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import CaptureQueriesContext
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'(?<![\w."])-?\d+(?:\.\d+)?\b')
+IN_LIST_RE = re.compile(r'\bIN \(\?(?:, \?)*\)')
+SPACE_RE = re.compile(r'\s+')
+
+
+def normalize(sql):
+    """Текст запроса без значений: одинаковые запросы с разными
+    параметрами дают одну строку."""
+    sql = STRING_RE.sub('?', sql)
+    sql = NUMBER_RE.sub('?', sql)
+    sql = IN_LIST_RE.sub('IN (...)', sql)
+    return SPACE_RE.sub(' ', sql).strip()
+
+
+def group_queries(queries):
+    """[(число повторов, нормализованный запрос)], частые первыми."""
+    counter = Counter(normalize(query['sql']) for query in queries)
+    return [(count, sql) for sql, count in counter.most_common()]
+
+
+def describe(queries):
+    return '\n'.join(
+        f'  {count} × {sql}' for count, sql in group_queries(queries)
+    )
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def check_budget(queries, budget, label=''):
+    """Падает, если запросов больше budget, и перечисляет их по группам."""
+    if len(queries) > budget:
+        label = f'{label}: ' if label else ''
+        raise QueryBudgetExceeded(
+            f'{label}{len(queries)} запросов при бюджете {budget}:\n'
+            f'{describe(queries)}'
+        )
+
+
+class query_budget(ContextDecorator):
+    """Проверяет, что блок выполняет не больше budget запросов.
+
+        with query_budget(4, label='posts:index'):
+            client.get(url)
+
+        @query_budget(2)
+        def test_something(self): ...
+
+    После выхода из блока запросы доступны в атрибуте queries.
+    """
+
+    def __init__(self, budget, label='', using=DEFAULT_DB_ALIAS):
+        self.budget = budget
+        self.label = label
+        self.using = using
+        self.queries = []
+
+    def __enter__(self):
+        self.context = CaptureQueriesContext(connections[self.using])
+        self.context.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.context.__exit__(exc_type, exc_value, traceback)
+        self.queries = self.context.captured_queries
+        if exc_type is None:
+            check_budget(self.queries, self.budget, self.label)
+        return False
+
+
+def assert_independent_of_size(label, runs):
+    """Проверяет, что число запросов не зависит от объёма данных.
+
+    runs — {объём данных: список запросов}. В сообщении об ошибке
+    перечислены запросы, число повторов которых менялось с объёмом.
+    """
+    counts = {size: len(queries) for size, queries in runs.items()}
+    if len(set(counts.values())) <= 1:
+        return
+    grouped = {
+        size: Counter(normalize(query['sql']) for query in queries)
+        for size, queries in runs.items()
+    }
+    statements = set().union(*grouped.values())
+    lines = []
+    for sql in sorted(statements):
+        repeats = [grouped[size][sql] for size in runs]
+        if len(set(repeats)) > 1:
+            shown = ', '.join(
+                f'{size}: {repeat}' for size, repeat in zip(runs, repeats)
+            )
+            lines.append(f'  [{shown}] {sql}')
+    sizes = ', '.join(f'{size}: {count}' for size, count in counts.items())
+    raise QueryBudgetExceeded(
+        f'{label}: число запросов растёт с объёмом данных ({sizes}):\n'
+        + '\n'.join(lines)
+    )
@@ -0,0 +1,64 @@
+import gzip
+import os
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+def compressors():
+    """[(расширение, функция сжатия)] для доступных кодировок."""
+    result = [('.gz', lambda data: gzip.compress(data, compresslevel=9))]
+    if brotli is not None:
+        result.insert(0, ('.br', brotli.compress))
+    return result
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """Статика с хешем содержимого в имени и сжатыми копиями рядом.
+
+    collectstatic пишет css/base.3f2a….css и рядом css/base.3f2a….css.gz и,
+    если установлен brotli, .br. Сжимаются только текстовые форматы из
+    STATIC_PRECOMPRESS_EXTENSIONS не меньше STATIC_PRECOMPRESS_MIN_SIZE
+    байт, и копия сохраняется, только если она меньше оригинала.
+    """
+    manifest_strict = False
+
+    def post_process(self, paths, dry_run=False, **options):
+        for name, hashed_name, processed in super().post_process(
+            paths, dry_run, **options
+        ):
+            if not dry_run and hashed_name and not isinstance(
+                processed, Exception
+            ):
+                self.compress(name)
+                self.compress(hashed_name)
+            yield name, hashed_name, processed
+
+    def compress(self, name):
+        extension = os.path.splitext(name)[1].lower()
+        if extension not in settings.STATIC_PRECOMPRESS_EXTENSIONS:
+            return
+        with self.open(name) as file:
+            data = file.read()
+        if len(data) < settings.STATIC_PRECOMPRESS_MIN_SIZE:
+            return
+        for suffix, compress in compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                if self.exists(name + suffix):
+                    self.delete(name + suffix)
+                self._save(name + suffix, ContentFile(compressed))
+
+    def stored_name(self, name):
+        try:
+            return super().stored_name(name)
+        except ValueError:
+            # collectstatic ещё не запускали (разработка, тесты): ссылаемся
+            # на файл без хеша.
+            return name
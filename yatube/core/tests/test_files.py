@@ -0,0 +1,180 @@
+import gzip
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from core.storage import brotli
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+TEMP_STATIC_DIR = tempfile.mkdtemp(dir=settings.BASE_DIR)
+CONTENT = b'0123456789abcdef'
+CSS = b'body { margin: 0; }\n' * 40
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServingTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts'), exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'cat.jpg'),
+                  'wb') as file:
+            file.write(CONTENT)
+        cls.url = reverse('media', args=('posts/cat.jpg',))
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def test_full_file(self):
+        """Проверяем, что файл отдаётся целиком с заголовками кеширования."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), CONTENT)
+        self.assertEqual(response['Content-Length'], str(len(CONTENT)))
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+        self.assertIn('max-age', response['Cache-Control'])
+
+    def test_ranges(self):
+        """Проверяем отдачу диапазонов и ответ на невыполнимый."""
+        cases = (
+            ('bytes=2-5', 206, b'2345', 'bytes 2-5/16'),
+            ('bytes=10-', 206, b'abcdef', 'bytes 10-15/16'),
+            ('bytes=-3', 206, b'def', 'bytes 13-15/16'),
+            ('bytes=14-100', 206, b'ef', 'bytes 14-15/16'),
+        )
+        for header, status, body, content_range in cases:
+            with self.subTest(range=header):
+                response = self.client.get(self.url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, status)
+                self.assertEqual(b''.join(response.streaming_content), body)
+                self.assertEqual(response['Content-Range'], content_range)
+                self.assertEqual(response['Content-Length'], str(len(body)))
+        response = self.client.get(self.url, HTTP_RANGE='bytes=16-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */16')
+
+    def test_range_of_empty_file_is_unsatisfiable(self):
+        """Проверяем, что любой диапазон пустого файла даёт 416."""
+        open(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'empty.jpg'), 'wb').close()
+        url = reverse('media', args=('posts/empty.jpg',))
+        for header in ('bytes=-3', 'bytes=0-'):
+            with self.subTest(range=header):
+                response = self.client.get(url, HTTP_RANGE=header)
+                self.assertEqual(response.status_code, 416)
+                self.assertEqual(response['Content-Range'], 'bytes */0')
+
+    def test_conditional_requests(self):
+        """Проверяем ответ 304 по ETag и дате и If-Range."""
+        first = self.client.get(self.url)
+        response = self.client.get(
+            self.url, HTTP_IF_NONE_MATCH=first['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], first['ETag'])
+        response = self.client.get(
+            self.url, HTTP_IF_MODIFIED_SINCE=first['Last-Modified']
+        )
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE='"stale"'
+        )
+        self.assertEqual(response.status_code, 200)
+        response = self.client.get(
+            self.url, HTTP_RANGE='bytes=0-1', HTTP_IF_RANGE=first['ETag']
+        )
+        self.assertEqual(response.status_code, 206)
+
+    def test_paths_outside_media_are_not_served(self):
+        """Проверяем, что каталоги и пути вне MEDIA_ROOT дают 404."""
+        for path in ('posts/', 'posts/missing.jpg', '../settings.py'):
+            with self.subTest(path=path):
+                response = self.client.get(settings.MEDIA_URL + path)
+                self.assertEqual(response.status_code, 404)
+
+    @override_settings(MEDIA_OFFLOAD_HEADER='X-Accel-Redirect')
+    def test_offload_to_proxy(self):
+        """Проверяем, что при передаче прокси тело не отдаётся."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'],
+                         '/protected-media/posts/cat.jpg')
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+
+    def test_content_addressed_files_are_immutable(self):
+        """Проверяем, что файлы с хешем в имени кешируются навсегда."""
+        name = f'posts/ab/{"ab" * 32}.jpg'
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts', 'ab'))
+        with open(os.path.join(TEMP_MEDIA_ROOT, name), 'wb') as file:
+            file.write(CONTENT)
+        response = self.client.get(reverse('media', args=(name,)))
+        self.assertIn('immutable', response['Cache-Control'])
+
+
+@override_settings(
+    STATICFILES_DIRS=(os.path.join(TEMP_STATIC_DIR, 'src'),),
+    STATIC_ROOT=os.path.join(TEMP_STATIC_DIR, 'root'),
+)
+class StaticPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        source = os.path.join(TEMP_STATIC_DIR, 'src')
+        os.makedirs(os.path.join(source, 'css'))
+        os.makedirs(os.path.join(source, 'img'))
+        with open(os.path.join(source, 'css', 'site.css'), 'wb') as file:
+            file.write(CSS)
+        with open(os.path.join(source, 'img', 'logo.png'), 'wb') as file:
+            file.write(CONTENT * 32)
+        call_command('collectstatic', interactive=False, verbosity=0)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_STATIC_DIR, ignore_errors=True)
+
+    def test_collectstatic_writes_hashed_and_compressed_files(self):
+        """Проверяем, что рядом с хешированным css лежат сжатые копии,
+        а картинка не сжимается."""
+        css = staticfiles_storage.stored_name('css/site.css')
+        self.assertRegex(css, r'^css/site\.[0-9a-f]{12}\.css$')
+        self.assertTrue(staticfiles_storage.exists(css + '.gz'))
+        self.assertEqual(
+            staticfiles_storage.exists(css + '.br'), brotli is not None
+        )
+        logo = staticfiles_storage.stored_name('img/logo.png')
+        self.assertFalse(staticfiles_storage.exists(logo + '.gz'))
+
+    def test_precompressed_copy_is_negotiated(self):
+        """Проверяем выбор сжатой копии по Accept-Encoding."""
+        url = staticfiles_storage.url('css/site.css')
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertEqual(
+            gzip.decompress(b''.join(response.streaming_content)), CSS
+        )
+        self.assertEqual(
+            response['Cache-Control'], 'public, max-age=31536000, immutable'
+        )
+        response = self.client.get(url, HTTP_ACCEPT_ENCODING='gzip;q=0')
+        self.assertNotIn('Content-Encoding', response)
+        self.assertEqual(b''.join(response.streaming_content), CSS)
+
+    def test_unhashed_names_are_not_immutable(self):
+        """Проверяем, что файл без хеша в имени кешируется ненадолго."""
+        response = self.client.get(settings.STATIC_URL + 'css/site.css')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('immutable', response['Cache-Control'])
@@ -1,6 +1,12 @@
-from django.shortcuts import render
+import re
 from http import HTTPStatus
 
+from django.conf import settings
+from django.shortcuts import render
+from django.views.decorators.http import require_safe
+
+from .files import serve_file
+
 
 def page_not_found(request, exception):
     return render(
@@ -24,3 +30,44 @@ def server_error(request):
         'core/500.html',
         status=HTTPStatus.INTERNAL_SERVER_ERROR
     )
+
+
+@require_safe
+def media(request, path):
+    """Отдаёт загруженные файлы: Range, условные запросы, X-Accel-Redirect.
+
+    Файлы, чьё имя выводится из содержимого, никогда не меняются, и
+    браузер может хранить их сколько угодно.
+    """
+    if re.match(settings.MEDIA_IMMUTABLE_PATTERN, path):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f'public, max-age={settings.MEDIA_MAX_AGE}'
+    return serve_file(
+        request,
+        path,
+        settings.MEDIA_ROOT,
+        cache_control=cache_control,
+        offload_header=settings.MEDIA_OFFLOAD_HEADER,
+        offload_prefix=settings.MEDIA_OFFLOAD_PREFIX,
+    )
+
+
+@require_safe
+def static_file(request, path):
+    """Отдаёт собранную статику, выбирая .br/.gz копию по Accept-Encoding.
+
+    Имена с хешем содержимого от CompressedManifestStaticFilesStorage
+    кешируются браузером на год без перепроверки.
+    """
+    if re.search(settings.STATIC_IMMUTABLE_PATTERN, path):
+        cache_control = 'public, max-age=31536000, immutable'
+    else:
+        cache_control = f'public, max-age={settings.STATIC_MAX_AGE}'
+    return serve_file(
+        request,
+        path,
+        settings.STATIC_ROOT,
+        cache_control=cache_control,
+        precompressed=True,
+    )
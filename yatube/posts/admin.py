@@ -1,15 +1,54 @@
+from django import forms
 from django.contrib import admin
+from django.db.models.expressions import RawSQL
 
+from . import search
 from .models import Group, Post
+from .paginator import EstimatedCountPaginator
 
 
 class PostAdmin(admin.ModelAdmin):
     list_display = ('pk', 'text', 'pub_date', 'author', 'group')
     list_editable = ('group',)
+    list_select_related = ('author', 'group')
     search_fields = ('text',)
     list_filter = ('pub_date',)
+    date_hierarchy = 'pub_date'
+    autocomplete_fields = ('author', 'group')
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    empty_value_display = '-пусто-'
+
+    def get_changelist_formset(self, request, **kwargs):
+        # В списке постов у каждой строки свой выбор группы: варианты
+        # читаются один раз на запрос и копируются в формы строк, вместо
+        # автодополнения с отдельным запросом на строку.
+        formset = super().get_changelist_formset(request, **kwargs)
+        field = formset.form.base_fields['group']
+        choices = [('', field.empty_label)]
+        choices.extend(
+            Group.objects.order_by('title').values_list('pk', 'title')
+        )
+        field.widget = forms.Select()
+        field.choices = choices
+        return formset
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(
+            pk__in=RawSQL(*search.matching_ids_sql(search_term))
+        ), False
+
+
+class GroupAdmin(admin.ModelAdmin):
+    list_display = ('pk', 'title', 'slug')
+    search_fields = ('title', 'slug')
+    ordering = ('title',)
     empty_value_display = '-пусто-'
 
 
 admin.site.register(Post, PostAdmin)
-admin.site.register(Group)
+admin.site.register(Group, GroupAdmin)
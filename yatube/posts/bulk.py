@@ -0,0 +1,62 @@
+"""Помощники для массовой записи из management-команд."""
+from contextlib import contextmanager
+from itertools import islice
+
+from django.core.management.color import no_style
+from django.db import connection
+
+
+@contextmanager
+def explicit_auto_now_add(model, *field_names):
+    """Даёт bulk_create сохранить заданные значения полей auto_now_add.
+
+    Меняет описание поля на уровне процесса, поэтому годится только для
+    команд, а не для кода, который выполняется в веб-процессе.
+    """
+    fields = [model._meta.get_field(name) for name in field_names]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field in fields:
+            field.auto_now_add = True
+
+
+def chunked(iterable, size):
+    """Режет поток на списки по size элементов, не читая его целиком."""
+    iterator = iter(iterable)
+    while True:
+        chunk = list(islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def reset_sequences(*models):
+    """Сдвигает последовательности первичных ключей за вставленные id.
+
+    Строки с явными id не двигают последовательность PostgreSQL; в SQLite
+    делать ничего не нужно.
+    """
+    statements = connection.ops.sequence_reset_sql(no_style(), models)
+    if statements:
+        with connection.cursor() as cursor:
+            for sql in statements:
+                cursor.execute(sql)
+
+
+def bulk_insert(model, objects, batch_size=None, **kwargs):
+    """bulk_create пачками не больше тех, что выдержит база.
+
+    Явный batch_size Django не сверяет с ограничениями базы, а SQLite не
+    принимает больше 500 строк в одном INSERT.
+    """
+    if not objects:
+        return
+    limit = connection.ops.bulk_batch_size(
+        model._meta.concrete_fields, objects
+    )
+    model.objects.bulk_create(
+        objects, batch_size=min(batch_size or limit, limit), **kwargs
+    )
@@ -0,0 +1,111 @@
+"""Версионированные ключи кеша лент и страниц.
+
+Каждая область (все посты, группа, автор, пост, подписки читателя)
+хранит в кеше номер версии. Версия входит в ключ закешированного
+фрагмента или сохраняется рядом со страницей, а сигналы моделей поднимают
+её при записи, поэтому старые записи просто перестают читаться и доживают
+до TTL, не попадая в выдачу.
+"""
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+
+ALL_POSTS = 'posts'
+# Поднимается при удалении любого комментария: оно меняет счётчик в
+# карточке, но не даты, по которым считается ETag главной.
+ALL_COMMENTS = 'comments'
+
+
+def group_scope(group_id):
+    return f'group:{group_id}'
+
+
+def author_scope(author_id):
+    return f'author:{author_id}'
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def follow_scope(user_id):
+    return f'follow:{user_id}'
+
+
+def post_scopes(posts):
+    """Области постов страницы ленты.
+
+    Комментарий поднимает версию своего поста, автора и группы, но не всей
+    ленты: главная и лента подписок, где видны счётчики комментариев,
+    зависят ещё и от постов на странице.
+    """
+    return [post_scope(post.pk) for post in posts]
+
+
+def _version_key(scope):
+    return f'version:{scope}'
+
+
+def _new_version():
+    # Версия от времени, а не с единицы: если ключ версии вытеснят из
+    # кеша, новое значение не совпадёт со старыми фрагментами.
+    return time.time_ns()
+
+
+def get_versions(*scopes):
+    keys = [_version_key(scope) for scope in scopes]
+    versions = cache.get_many(keys)
+    missing = {key: _new_version() for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=None)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def bump(*scopes):
+    for scope in scopes:
+        try:
+            cache.incr(_version_key(scope))
+        except ValueError:
+            cache.set(_version_key(scope), _new_version(), timeout=None)
+
+
+def feed_cache(request, feed, *scopes):
+    """Параметры {% cache %} для ленты feed.
+
+    Ключ зависит от типа ленты, версий её областей и читателя: в карточках
+    есть ссылки, которые видит только автор поста.
+    """
+    versions = get_versions(*scopes)
+    parts = [feed, *map(str, versions), f'user{request.user.pk or 0}']
+    return {
+        'key': ':'.join(parts),
+        'timeout': settings.FEED_CACHE_TIMEOUT,
+    }
+
+
+def page_depends_on(request, *scopes):
+    """Разрешает кешировать страницу для анонимных читателей.
+
+    Версии читаются до отрисовки: запись, случившаяся во время рендера,
+    сделает сохранённую страницу устаревшей, а не наоборот.
+    """
+    request.page_cache_scopes = (scopes, get_versions(*scopes))
+
+
+def page_etag(request, last_changes, *scopes):
+    """ETag страницы для условного GET.
+
+    Складывается из времени последней публикации и последнего комментария
+    в области страницы, версий её областей (их поднимают правки и
+    удаления, не меняющие дат) и читателя. Вычисляется до представления,
+    поэтому при совпадении шаблон не отрисовывается.
+    """
+    parts = [
+        *(value.isoformat() if value else '-' for value in last_changes),
+        *map(str, get_versions(*scopes)),
+        f'user{request.user.pk or 0}',
+    ]
+    return hashlib.md5(':'.join(parts).encode()).hexdigest()
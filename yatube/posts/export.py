@@ -0,0 +1,128 @@
+"""Потоковая выгрузка постов, комментариев и подписок.
+
+Строки читаются keyset-пачками по первичному ключу, каждая пачка —
+через .iterator(chunk_size=…), и сразу превращаются в строки JSONL или
+CSV. Ни выборка целиком, ни файл целиком в памяти не держатся, поэтому
+расход памяти не зависит от объёма. Формат совпадает с тем, что читает
+команда import_yatube.
+"""
+import csv
+import json
+import zlib
+
+from django.core.serializers.json import DjangoJSONEncoder
+
+from .models import Comment, Follow, Post
+
+# Поле выгрузки -> выражение для .values().
+FIELDS = {
+    'posts': {
+        'id': 'id',
+        'author': 'author__username',
+        'group': 'group__slug',
+        'text': 'text',
+        'pub_date': 'pub_date',
+        'image': 'image',
+    },
+    'comments': {
+        'id': 'id',
+        'post': 'post',
+        'author': 'author__username',
+        'text': 'text',
+        'created': 'created',
+    },
+    'follows': {
+        'id': 'id',
+        'user': 'user__username',
+        'author': 'author__username',
+    },
+}
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+CONTENT_TYPES = {
+    'jsonl': 'application/x-ndjson; charset=utf-8',
+    'csv': 'text/csv; charset=utf-8',
+}
+
+
+def records(kind, queryset=None, chunk_size=1000):
+    """Словари выгрузки в порядке первичного ключа.
+
+    Каждая пачка — отдельный короткий запрос «pk > последний», так что
+    курсор не держит открытой транзакцию на время всей выгрузки.
+    """
+    fields = FIELDS[kind]
+    if queryset is None:
+        queryset = MODELS[kind].objects.all()
+    queryset = queryset.order_by('pk').values(*fields.values())
+    last_pk = None
+    while True:
+        batch = queryset
+        if last_pk is not None:
+            batch = batch.filter(pk__gt=last_pk)
+        count = 0
+        for row in batch[:chunk_size].iterator(chunk_size=chunk_size):
+            count += 1
+            last_pk = row['id']
+            yield {name: row[lookup] for name, lookup in fields.items()}
+        if count < chunk_size:
+            return
+
+
+class Echo:
+    """Файлоподобный объект для csv.writer: возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def csv_value(value):
+    if value is None:
+        return ''
+    if hasattr(value, 'isoformat'):
+        return value.isoformat()
+    return value
+
+
+def encode(rows, kind, output_format):
+    """Строки JSONL или CSV (с заголовком) для словарей rows."""
+    if output_format == 'csv':
+        writer = csv.writer(Echo())
+        yield writer.writerow(FIELDS[kind])
+        for row in rows:
+            yield writer.writerow([csv_value(value) for value in row.values()])
+        return
+    for row in rows:
+        yield json.dumps(row, cls=DjangoJSONEncoder, ensure_ascii=False)
+        yield '\n'
+
+
+def to_bytes(lines, compress=False, buffer_size=64 * 1024):
+    """Кодирует строки в UTF-8 блоками по buffer_size байт.
+
+    compress=True сжимает поток gzip на лету: каждый блок проходит через
+    один zlib-компрессор, и получается обычный файл .gz.
+    """
+    compressor = zlib.compressobj(wbits=31) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode()
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            block = b''.join(buffer)
+            buffer, size = [], 0
+            yield compressor.compress(block) if compressor else block
+    block = b''.join(buffer)
+    if compressor:
+        yield compressor.compress(block) + compressor.flush()
+    elif block:
+        yield block
+
+
+def stream(kind, output_format, queryset=None, compress=False,
+           chunk_size=1000):
+    return to_bytes(
+        encode(records(kind, queryset, chunk_size), kind, output_format),
+        compress,
+    )
@@ -0,0 +1,127 @@
+"""Варианты картинки поста разной ширины для srcset.
+
+Для картинки posts/cat.jpg рядом с ней сохраняются posts/cat_w320.jpg,
+posts/cat_w320.webp и так далее для каждой ширины из
+settings.IMAGE_VARIANT_WIDTHS, не больше ширины оригинала, с пропорциями
+карточки settings.IMAGE_VARIANT_ASPECT. WebP режется, только если Pillow
+собран с его поддержкой. Список созданных файлов хранится в
+Post.image_variants строкой вида «320.jpg 320.webp 640.jpg», поэтому для
+отрисовки srcset не нужно ни одного обращения к хранилищу.
+"""
+import io
+import os
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, features
+from sorl.thumbnail import default
+from sorl.thumbnail.images import ImageFile
+
+FORMATS = {
+    'webp': ('WEBP', 'image/webp'),
+    'jpg': ('JPEG', 'image/jpeg'),
+}
+
+
+def available_extensions():
+    return [
+        extension for extension in settings.IMAGE_VARIANT_FORMATS
+        if extension != 'webp' or features.check('webp')
+    ]
+
+
+def variant_name(name, width, extension):
+    root, _ = os.path.splitext(name)
+    return f'{root}_w{width}.{extension}'
+
+
+def parse_variants(variants):
+    """{расширение: [ширины по возрастанию]} из Post.image_variants."""
+    widths = defaultdict(list)
+    for token in variants.split():
+        width, _, extension = token.partition('.')
+        widths[extension].append(int(width))
+    return {
+        extension: sorted(values) for extension, values in widths.items()
+    }
+
+
+def _crop_to_aspect(image):
+    aspect_width, aspect_height = settings.IMAGE_VARIANT_ASPECT
+    width, height = image.size
+    if width * aspect_height > height * aspect_width:
+        new_width = max(1, height * aspect_width // aspect_height)
+        left = (width - new_width) // 2
+        return image.crop((left, 0, left + new_width, height))
+    new_height = max(1, width * aspect_height // aspect_width)
+    top = (height - new_height) // 2
+    return image.crop((0, top, width, top + new_height))
+
+
+def _widths_for(source_width):
+    widths = sorted(settings.IMAGE_VARIANT_WIDTHS)
+    # Самую узкую ширину режем всегда, даже растягивая маленький оригинал.
+    return [widths[0]] + [
+        width for width in widths[1:] if width <= source_width
+    ]
+
+
+def generate_variants(image):
+    """Создаёт недостающие варианты картинки image (FieldFile).
+
+    Возвращает значение для Post.image_variants.
+    """
+    storage = image.storage
+    # Имя варианта выводится из имени оригинала, поэтому хранилище не
+    # должно его менять.
+    save = getattr(storage, 'save_derived', storage.save)
+    with storage.open(image.name, 'rb') as source:
+        original = Image.open(source)
+        original.load()
+    cropped = _crop_to_aspect(original.convert('RGB'))
+    aspect_width, aspect_height = settings.IMAGE_VARIANT_ASPECT
+    tokens = []
+    for width in _widths_for(cropped.width):
+        height = max(1, round(width * aspect_height / aspect_width))
+        resized = None
+        for extension in available_extensions():
+            name = variant_name(image.name, width, extension)
+            if not storage.exists(name):
+                if resized is None:
+                    resized = cropped.resize((width, height), Image.LANCZOS)
+                buffer = io.BytesIO()
+                resized.save(
+                    buffer,
+                    FORMATS[extension][0],
+                    quality=settings.IMAGE_VARIANT_QUALITY,
+                )
+                save(name, ContentFile(buffer.getvalue()))
+            tokens.append(f'{width}.{extension}')
+    return ' '.join(tokens)
+
+
+def variant_urls(image, variants):
+    """{расширение: [(ширина, url)]} для готовых вариантов картинки."""
+    return {
+        extension: [
+            (width, image.storage.url(
+                variant_name(image.name, width, extension)
+            ))
+            for width in widths
+        ]
+        for extension, widths in parse_variants(variants).items()
+    }
+
+
+def srcset(urls):
+    return ', '.join(f'{url} {width}w' for width, url in urls)
+
+
+def delete_files(name, storage):
+    """Удаляет файл картинки, все её возможные варианты и миниатюры sorl."""
+    for width in settings.IMAGE_VARIANT_WIDTHS:
+        for extension in FORMATS:
+            storage.delete(variant_name(name, width, extension))
+    default.kvstore.delete(ImageFile(name, storage))
+    storage.delete(name)
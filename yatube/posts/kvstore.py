@@ -0,0 +1,111 @@
+"""Key-value хранилище sorl-thumbnail поверх кеша Django.
+
+Записи о картинках и миниатюрах по-прежнему сохраняются в базе (таблица
+sorl), но читаются из кеша Django, а перед ним стоит LRU в памяти
+процесса. Локально хранятся только найденные записи и не дольше
+THUMBNAIL_LOCAL_CACHE_TIMEOUT: отсутствие миниатюры может измениться в
+другом процессе в любой момент. prefetch() читает записи для целой
+страницы одним get_many, а то, чего нет в кеше, — одним запросом к базе.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.kvstores.base import add_prefix
+from sorl.thumbnail.kvstores.cached_db_kvstore import EMPTY_VALUE
+from sorl.thumbnail.kvstores.cached_db_kvstore import KVStore as CachedDBStore
+from sorl.thumbnail.models import KVStore as KVStoreModel
+
+
+class LocalLRU:
+    """Потокобезопасный LRU со сроком жизни записей."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            value, expires = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        max_size = settings.THUMBNAIL_LOCAL_CACHE_SIZE
+        if not max_size:
+            return
+        expires = time.monotonic() + settings.THUMBNAIL_LOCAL_CACHE_TIMEOUT
+        with self.lock:
+            self.entries[key] = (value, expires)
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_size:
+                self.entries.popitem(last=False)
+
+    def delete(self, *keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+
+
+class KVStore(CachedDBStore):
+    local = LocalLRU()
+
+    def _get_raw(self, key):
+        value = self.local.get(key)
+        if value is None:
+            value = super()._get_raw(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def _set_raw(self, key, value):
+        super()._set_raw(key, value)
+        self.local.set(key, value)
+
+    def _delete_raw(self, *keys):
+        super()._delete_raw(*keys)
+        self.local.delete(*keys)
+
+    def clear(self, delete_thumbnails=False):
+        super().clear(delete_thumbnails)
+        self.local.clear()
+
+    def prefetch(self, image_files):
+        """Загружает записи image_files в локальный LRU пачкой.
+
+        Один get_many к кешу и, для промахов, один запрос к базе; чего нет
+        и в базе, запоминается в кеше как отсутствующее, как это делает
+        _get_raw.
+        """
+        keys = {add_prefix(image_file.key) for image_file in image_files}
+        missing = [key for key in keys if self.local.get(key) is None]
+        if not missing:
+            return
+        found = self.cache.get_many(missing)
+        missing = [key for key in missing if key not in found]
+        if missing:
+            stored = dict(
+                KVStoreModel.objects.filter(key__in=missing).values_list(
+                    'key', 'value'
+                )
+            )
+            fetched = {key: stored.get(key, EMPTY_VALUE) for key in missing}
+            self.cache.set_many(
+                fetched, sorl_settings.THUMBNAIL_CACHE_TIMEOUT
+            )
+            found.update(fetched)
+        for key, value in found.items():
+            if value != EMPTY_VALUE:
+                self.local.set(key, value)
@@ -0,0 +1,28 @@
+from posts.models import Post
+
+from .pregenerate_thumbnails import Command as PregenerateCommand
+
+
+class Command(PregenerateCommand):
+    help = (
+        'Нарезает варианты для srcset картинкам постов, у которых их ещё '
+        'нет, в --workers потоков (0 — в текущем потоке).'
+    )
+
+    def add_arguments(self, parser):
+        super().add_arguments(parser)
+        parser.add_argument(
+            '--images',
+            nargs='+',
+            help='Обработать только посты с этими файлами картинок.',
+        )
+
+    def handle(self, *args, **options):
+        self.images = options['images']
+        super().handle(*args, **options)
+
+    def get_queryset(self):
+        posts = Post.objects.exclude(image='').filter(image_variants='')
+        if self.images:
+            posts = posts.filter(image__in=self.images)
+        return posts
@@ -0,0 +1,128 @@
+import random
+import time
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from posts.bulk import explicit_auto_now_add
+from posts.models import Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+FEED_INDEXES = (Post, Follow)
+
+
+class Command(BaseCommand):
+    help = (
+        'Печатает план (EXPLAIN) и время запросов лент с составными '
+        'индексами и без них. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Сколько постов сгенерировать перед замером.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['seed']:
+                self.seed(options['seed'])
+            queries = self.feed_queries()
+            self.report('С индексами', queries, options['repeat'])
+            self.drop_feed_indexes()
+            self.report('Без индексов', queries, options['repeat'])
+            transaction.set_rollback(True)
+
+    def seed(self, amount):
+        # SQLite не возвращает id из bulk_create, поэтому созданные строки
+        # перечитываются по уникальному префиксу.
+        now = timezone.now()
+        prefix = f'bench{int(now.timestamp())}'
+        User.objects.bulk_create(
+            User(username=f'{prefix}_{i}')
+            for i in range(max(10, amount // 100))
+        )
+        Group.objects.bulk_create(
+            Group(title=f'Группа {i}', slug=f'{prefix}-{i}', description='')
+            for i in range(10)
+        )
+        users = list(User.objects.filter(username__startswith=prefix))
+        groups = list(Group.objects.filter(slug__startswith=prefix))
+        with explicit_auto_now_add(Post, 'pub_date'):
+            Post.objects.bulk_create(
+                Post(
+                    text=f'Пост {i}',
+                    author=random.choice(users),
+                    group=random.choice(groups + [None]),
+                    pub_date=now - timedelta(minutes=i),
+                ) for i in range(amount)
+            )
+        for author in users[1:]:
+            Follow.objects.create(user=users[0], author=author)
+
+    def feed_queries(self):
+        post = Post.objects.order_by('-pub_date', '-id').first()
+        follow = Follow.objects.first()
+        if post is None or follow is None:
+            self.stderr.write('База пуста: запустите команду с --seed.')
+            return {}
+        posts = Post.objects.select_related('author', 'group').order_by(
+            '-pub_date', '-id'
+        )
+        queries = {
+            'index': posts.all(),
+            'profile': posts.filter(author_id=post.author_id),
+            'follow (timeline)': TimelineEntry.objects.filter(
+                user_id=follow.user_id
+            ).order_by('-pub_date', '-post_id'),
+            'follow (join)': posts.filter(
+                author__following__user_id=follow.user_id
+            ),
+            'fan-out followers': Follow.objects.filter(
+                author_id=follow.author_id
+            ).values_list('user_id', flat=True),
+        }
+        group_id = Post.objects.exclude(group=None).values_list(
+            'group_id', flat=True
+        ).first()
+        if group_id:
+            queries['group'] = posts.filter(group_id=group_id)
+        return {name: queryset[:10] for name, queryset in queries.items()}
+
+    def report(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, queryset in queries.items():
+            started = time.perf_counter()
+            for _ in range(repeat):
+                list(queryset.all())
+            elapsed = (time.perf_counter() - started) / repeat
+            self.stdout.write(f'{name}: {elapsed * 1000:.3f} ms')
+            for row in self.explain(queryset, title):
+                self.stdout.write(f'  {row}')
+
+    def explain(self, queryset, label):
+        sql, params = queryset.query.sql_with_params()
+        prefix = connection.ops.explain_query_prefix()
+        with connection.cursor() as cursor:
+            # Метка меняет текст запроса: иначе sqlite3 отдаст план из кеша
+            # подготовленных выражений, составленный до удаления индексов.
+            cursor.execute(f'{prefix} {sql} -- {label}', params)
+            return [
+                ' '.join(str(column) for column in row)
+                for row in cursor.fetchall()
+            ]
+
+    def drop_feed_indexes(self):
+        with connection.cursor() as cursor:
+            for model in FEED_INDEXES:
+                for index in model._meta.indexes:
+                    cursor.execute(
+                        f'DROP INDEX {connection.ops.quote_name(index.name)}'
+                    )
@@ -0,0 +1,38 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+
+TEMPLATE = 'posts/includes/paginator.html'
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет время и размер отрисовки навигации по страницам '
+        'для лент разной длины.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--pages',
+            type=int,
+            nargs='+',
+            default=[10, 1000, 100000, 10000000],
+            help='Число страниц в ленте.',
+        )
+        parser.add_argument('--repeat', type=int, default=200)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{"pages":>10} {"ms/render":>10} {"bytes":>8}')
+        for num_pages in options['pages']:
+            # range знает свою длину и режется без выборки данных, поэтому
+            # замер показывает стоимость только шаблона навигации.
+            page_obj = Paginator(range(num_pages), 1).page(num_pages // 2)
+            started = time.perf_counter()
+            for _ in range(options['repeat']):
+                html = render_to_string(TEMPLATE, {'page_obj': page_obj})
+            elapsed = (time.perf_counter() - started) / options['repeat']
+            self.stdout.write(
+                f'{num_pages:>10} {elapsed * 1000:>10.3f} {len(html):>8}'
+            )
@@ -0,0 +1,163 @@
+import math
+import time
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils.http import urlencode
+
+from posts import urls
+from posts.models import Group, Post, User
+from posts.seed import Seeder
+
+# Адреса, которые на GET меняют данные: их повтор исказил бы замер.
+MUTATING = ('add_comment', 'profile_follow', 'profile_unfollow')
+# Адреса, которые открываются только автору поста или профиля.
+AUTHOR_ONLY = ('post_edit', 'profile_export')
+
+
+def percentile(values, share):
+    """Значение, не меньше которого share процентов выборки."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(share / 100 * len(ordered)) - 1)]
+
+
+def response_size(response):
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+class Command(BaseCommand):
+    help = (
+        'Наполняет базу синтетическими данными до каждого из --scales '
+        'постов и прогоняет все адреса posts/urls.py через тестовый '
+        'клиент: число запросов, p50/p95/p99 времени ответа и размер '
+        'страницы. Все изменения откатываются.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales',
+            type=int,
+            nargs='+',
+            default=[10000, 100000, 1000000],
+            help='Число постов в базе для каждого замера.',
+        )
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument(
+            '--warm',
+            action='store_true',
+            help='Не очищать кеш между запросами.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--keep',
+            action='store_true',
+            help='Оставить сгенерированные данные в базе.',
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(seed=options['seed'])
+        with transaction.atomic():
+            for scale in sorted(options['scales']):
+                self.grow(seeder, scale)
+                self.report(scale, options['repeat'], options['warm'])
+            transaction.set_rollback(not options['keep'])
+
+    def grow(self, seeder, scale):
+        """Досоздаёт данные, пока постов в базе не станет scale."""
+        missing = scale - Post.objects.count()
+        if missing <= 0:
+            return
+        self.stdout.write(f'Заполнение до {scale} постов…')
+        user_ids = seeder.users(max(10, missing // 100))
+        group_ids = seeder.groups(max(1, missing // 10000))
+        post_ids = seeder.posts(missing, user_ids, group_ids)
+        seeder.comments(missing // 2, post_ids, user_ids)
+        seeder.follows(user_ids, user_ids)
+        for name in ('sync_author_stats', 'sync_post_comments',
+                     'sync_timelines'):
+            call_command(name, stdout=StringIO())
+
+    def samples(self):
+        """Значения параметров адресов и читатель для замера.
+
+        Читатель — пользователь с самым большим числом подписок, профиль и
+        пост — самого популярного автора, то есть самые тяжёлые страницы.
+        Страницы только для автора открываются от его имени.
+        """
+        reader = User.objects.annotate(
+            follows=Count('follower')
+        ).order_by('-follows', 'pk').first()
+        author = User.objects.annotate(
+            followers=Count('following')
+        ).order_by('-followers', 'pk').first()
+        post = Post.objects.filter(author=author).order_by(
+            '-comments_count', '-pk'
+        ).first() or Post.objects.first()
+        group = Group.objects.annotate(
+            total=Count('posts')
+        ).order_by('-total', 'pk').first()
+        params = {
+            'post_id': post.pk,
+            'username': author.username,
+            'slug': group.slug if group else 'missing',
+        }
+        return reader, author, params
+
+    def report(self, scale, repeat, warm):
+        reader, author, params = self.samples()
+        clients = {}
+        for user in (reader, author):
+            clients[user] = Client()
+            clients[user].force_login(user)
+        self.stdout.write(self.style.MIGRATE_HEADING(
+            f'{scale} постов, читатель {reader.username}'
+        ))
+        self.stdout.write(
+            f'{"url":<24} {"status":>6} {"queries":>7} {"p50 ms":>8} '
+            f'{"p95 ms":>8} {"p99 ms":>8} {"bytes":>9}'
+        )
+        for pattern in urls.urlpatterns:
+            if not isinstance(pattern, URLPattern):
+                continue
+            name = f'{urls.app_name}:{pattern.name}'
+            if pattern.name in MUTATING:
+                self.stdout.write(f'{name:<24} пропущен: меняет данные')
+                continue
+            url = reverse(name, kwargs={
+                key: params[key] for key in pattern.pattern.converters
+            })
+            if pattern.name == 'search':
+                word = Post.objects.values_list('text', flat=True).first()
+                url += '?' + urlencode({'q': word.split()[0].strip('.,')})
+            client = clients[
+                author if pattern.name in AUTHOR_ONLY else reader
+            ]
+            self.measure(client, name, url, repeat, warm)
+
+    def measure(self, client, name, url, repeat, warm):
+        timings = []
+        for attempt in range(repeat):
+            if not warm:
+                cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = client.get(url)
+                size = response_size(response)
+                timings.append((time.perf_counter() - started) * 1000)
+            if attempt == 0:
+                status, count = response.status_code, len(queries)
+        self.stdout.write(
+            f'{name:<24} {status:>6} {count:>7} '
+            f'{percentile(timings, 50):>8.1f} '
+            f'{percentile(timings, 95):>8.1f} '
+            f'{percentile(timings, 99):>8.1f} {size:>9}'
+        )
@@ -0,0 +1,90 @@
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import export
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = (
+        'Выгружает посты, комментарии или подписки в JSONL или CSV потоком '
+        'keyset-пачками по --chunk-size строк, по --gzip — со сжатием на '
+        'лету. Формат совместим с import_yatube.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=tuple(export.MODELS))
+        parser.add_argument(
+            '--output',
+            default='-',
+            help='Файл выгрузки; «-» — стандартный вывод.',
+        )
+        parser.add_argument('--format', choices=tuple(export.CONTENT_TYPES))
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument(
+            '--author',
+            help='Выгрузить только посты или комментарии этого автора.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        output = options['output']
+        compress = options['gzip'] or output.endswith('.gz')
+        name = output[:-3] if output.endswith('.gz') else output
+        output_format = options['format'] or (
+            'csv' if name.endswith('.csv') else 'jsonl'
+        )
+        queryset = None
+        if options['author']:
+            if options['kind'] == 'follows':
+                raise CommandError('--author не применяется к подпискам.')
+            author = User.objects.filter(
+                username=options['author']
+            ).first()
+            if author is None:
+                raise CommandError(f'Автор {options["author"]} не найден.')
+            queryset = export.MODELS[options['kind']].objects.filter(
+                author=author
+            )
+        rows = export.records(
+            options['kind'], queryset, options['chunk_size']
+        )
+        counted = self.count(rows)
+        chunks = export.to_bytes(
+            export.encode(counted, options['kind'], output_format), compress
+        )
+        started = time.monotonic()
+        if output == '-':
+            self.write_stdout(chunks, compress)
+            report = self.stderr
+        else:
+            with open(output, 'wb') as file:
+                for chunk in chunks:
+                    file.write(chunk)
+            report = self.stdout
+        elapsed = time.monotonic() - started
+        rate = self.rows / elapsed if elapsed else 0
+        report.write(
+            f'Выгружено строк: {self.rows}, {rate:.0f} строк/с',
+            style_func=self.style.SUCCESS,
+        )
+
+    def count(self, rows):
+        self.rows = 0
+        for row in rows:
+            self.rows += 1
+            yield row
+
+    def write_stdout(self, chunks, compress):
+        if compress:
+            # Сжатые байты пишутся мимо текстовой обёртки вывода.
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+        for chunk in chunks:
+            self.stdout.write(chunk.decode(), ending='')
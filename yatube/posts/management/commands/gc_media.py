@@ -0,0 +1,91 @@
+import os
+import re
+import time
+from functools import reduce
+from itertools import islice
+from operator import or_
+
+from django.core.management.base import BaseCommand
+from django.db.models import Q
+
+from posts import images
+from posts.models import Post
+
+VARIANT_RE = re.compile(r'^(?P<root>.+)_w\d+\.(?:{})$'.format(
+    '|'.join(images.FORMATS)
+))
+
+
+class Command(BaseCommand):
+    help = (
+        'Удаляет из каталога картинок постов файлы, на которые не ссылается '
+        'ни один пост: оригиналы вместе с миниатюрами и варианты без '
+        'оригинала. Файлы моложе --min-age секунд не трогаются: их пост '
+        'может быть ещё не сохранён.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--min-age', type=int, default=60 * 60)
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Только показать, что было бы удалено.',
+        )
+
+    def handle(self, *args, **options):
+        field = Post._meta.get_field('image')
+        storage = field.storage
+        deadline = time.time() - options['min_age']
+        files = self.old_files(storage, field.upload_to, deadline)
+        removed = 0
+        while True:
+            chunk = list(islice(files, options['chunk_size']))
+            if not chunk:
+                break
+            for name in self.orphans(chunk):
+                removed += 1
+                self.stdout.write(name)
+                if not options['dry_run']:
+                    if VARIANT_RE.match(name):
+                        storage.delete(name)
+                    else:
+                        images.delete_files(name, storage)
+        verb = 'Можно удалить' if options['dry_run'] else 'Удалено'
+        self.stdout.write(self.style.SUCCESS(f'{verb} файлов: {removed}'))
+
+    @staticmethod
+    def old_files(storage, directory, deadline):
+        root = storage.path(directory)
+        for dirpath, _, filenames in os.walk(root):
+            for filename in filenames:
+                path = os.path.join(dirpath, filename)
+                if os.path.getmtime(path) < deadline:
+                    yield os.path.relpath(path, storage.location).replace(
+                        os.sep, '/'
+                    )
+
+    @staticmethod
+    def orphans(names):
+        """Имена из names, на которые не ссылается ни один пост."""
+        roots = {}
+        for name in names:
+            match = VARIANT_RE.match(name)
+            if match:
+                roots[name] = match.group('root') + '.'
+        conditions = [Q(image__in=names)] + [
+            Q(image__startswith=root) for root in set(roots.values())
+        ]
+        referenced = set(
+            Post.objects.filter(reduce(or_, conditions)).values_list(
+                'image', flat=True
+            )
+        )
+        referenced_roots = {
+            os.path.splitext(image)[0] + '.' for image in referenced
+        }
+        return [
+            name for name in names
+            if name not in referenced
+            and roots.get(name) not in referenced_roots
+        ]
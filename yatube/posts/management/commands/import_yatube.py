@@ -0,0 +1,316 @@
+import contextlib
+import csv
+import gzip
+import json
+import sys
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import cache, timeline
+from posts.bulk import (bulk_insert, chunked, explicit_auto_now_add,
+                        reset_sequences)
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+MODELS = {'posts': Post, 'comments': Comment, 'follows': Follow}
+
+
+def open_input(path):
+    if path == '-':
+        return contextlib.nullcontext(sys.stdin)
+    opener = gzip.open if path.endswith('.gz') else open
+    return opener(path, 'rt', encoding='utf-8', newline='')
+
+
+def guess_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'csv' if name.endswith('.csv') else 'jsonl'
+
+
+def read_records(file, input_format):
+    """Записи файла по одной: словари из строк JSONL или из CSV."""
+    if input_format == 'csv':
+        yield from csv.DictReader(file)
+        return
+    for number, line in enumerate(file, 1):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as error:
+            raise CommandError(f'Строка {number}: {error}')
+        if not isinstance(record, dict):
+            raise CommandError(f'Строка {number}: ожидался объект')
+        yield record
+
+
+def parse_timestamp(value, default):
+    """Дата из ISO 8601; без значения — default, как у auto_now_add."""
+    if not value:
+        return default
+    parsed = parse_datetime(value)
+    if parsed is None:
+        raise ValueError(f'непонятная дата {value!r}')
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_id(value):
+    return int(value) if value not in (None, '') else None
+
+
+class NameMap:
+    """Имя (username, slug) -> pk для всей таблицы в памяти.
+
+    Если задан build, неизвестные имена создаются одним bulk_create на
+    пачку записей.
+    """
+
+    def __init__(self, model, field, build=None):
+        self.model = model
+        self.field = field
+        self.build = build
+        self.pks = dict(
+            model.objects.values_list(field, 'pk').iterator(chunk_size=10000)
+        )
+
+    def get(self, name):
+        return self.pks.get(name)
+
+    def add_missing(self, names):
+        missing = {name for name in names if name and name not in self.pks}
+        if not missing or self.build is None:
+            return
+        self.model.objects.bulk_create(
+            (self.build(name) for name in missing), ignore_conflicts=True
+        )
+        self.pks.update(
+            self.model.objects.filter(
+                **{f'{self.field}__in': missing}
+            ).values_list(self.field, 'pk')
+        )
+
+
+def new_user(username):
+    user = User(username=username)
+    user.set_unusable_password()
+    return user
+
+
+def new_group(slug):
+    return Group(title=slug, slug=slug, description='')
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает посты, комментарии или подписки из JSONL или CSV '
+        '(можно .gz, «-» — стандартный ввод) пачками bulk_create и '
+        'сверяет счётчики, ленты и кеши. Авторы — по username, группы — '
+        'по slug, пост комментария — по id. Даты pub_date и created '
+        'берутся из файла, если они там есть.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('kind', choices=tuple(MODELS))
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=('jsonl', 'csv'))
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=20000,
+            help='Сколько строк записывать в одной транзакции.',
+        )
+        parser.add_argument(
+            '--create-missing',
+            action='store_true',
+            help='Создавать неизвестных авторов и группы.',
+        )
+        parser.add_argument(
+            '--skip-sync',
+            action='store_true',
+            help='Не сверять данные после загрузки (для серии файлов).',
+        )
+
+    def handle(self, *args, **options):
+        kind = options['kind']
+        create = options['create_missing']
+        self.users = NameMap(User, 'username', new_user if create else None)
+        self.groups = NameMap(Group, 'slug', new_group if create else None)
+        self.skipped = 0
+        build = getattr(self, f'build_{kind}')
+        input_format = options['format'] or guess_format(options['path'])
+        started = time.monotonic()
+        loaded = 0
+        with open_input(options['path']) as file, explicit_auto_now_add(
+            Post, 'pub_date'
+        ), explicit_auto_now_add(Comment, 'created'):
+            records = read_records(file, input_format)
+            for chunk in chunked(records, options['chunk_size']):
+                self.scopes = set()
+                objects = build(chunk)
+                with transaction.atomic():
+                    bulk_insert(
+                        MODELS[kind],
+                        objects,
+                        options['batch_size'],
+                        ignore_conflicts=kind == 'follows',
+                    )
+                # Сверяется каждая записанная пачка: в памяти не копятся
+                # id всего файла, а в сверку не попадает остальная база.
+                if not options['skip_sync']:
+                    self.reconcile(kind, objects)
+                # Сигналы при bulk_create не срабатывают: сбрасываем кеши
+                # сами.
+                cache.bump(*self.scopes)
+                loaded += len(objects)
+                self.progress(loaded, started)
+        self.stdout.write(self.style.SUCCESS(
+            f'Загружено: {loaded}, пропущено: {self.skipped}, '
+            f'{self.rate(loaded, started)}'
+        ))
+        reset_sequences(MODELS[kind])
+
+    @staticmethod
+    def rate(rows, started):
+        elapsed = time.monotonic() - started
+        return f'{rows / elapsed if elapsed else 0:.0f} строк/с'
+
+    def progress(self, rows, started):
+        self.stdout.write(f'{rows} строк, {self.rate(rows, started)}')
+
+    def skip(self, record, reason):
+        self.skipped += 1
+        self.stderr.write(f'Пропущено ({reason}): {record}')
+
+    def build_posts(self, records):
+        self.users.add_missing(record.get('author') for record in records)
+        self.groups.add_missing(record.get('group') for record in records)
+        now = timezone.now()
+        posts = []
+        for record in records:
+            author_id = self.users.get(record.get('author'))
+            group_id = self.groups.get(record.get('group'))
+            if author_id is None or (record.get('group') and not group_id):
+                self.skip(record, 'неизвестный автор или группа')
+                continue
+            try:
+                post = Post(
+                    id=parse_id(record.get('id')),
+                    text=record.get('text') or '',
+                    author_id=author_id,
+                    group_id=group_id,
+                    image=record.get('image') or '',
+                    pub_date=parse_timestamp(record.get('pub_date'), now),
+                )
+            except ValueError as error:
+                self.skip(record, error)
+                continue
+            posts.append(post)
+            self.scopes.add(cache.ALL_POSTS)
+            self.scopes.add(cache.author_scope(author_id))
+            if group_id:
+                self.scopes.add(cache.group_scope(group_id))
+        return posts
+
+    def build_comments(self, records):
+        self.users.add_missing(record.get('author') for record in records)
+        post_ids = set()
+        for record in records:
+            with contextlib.suppress(TypeError, ValueError):
+                post_ids.add(parse_id(record.get('post')))
+        existing = {
+            pk: (author_id, group_id)
+            for pk, author_id, group_id in Post.objects.filter(
+                pk__in=post_ids
+            ).values_list('pk', 'author_id', 'group_id')
+        }
+        now = timezone.now()
+        comments = []
+        for record in records:
+            author_id = self.users.get(record.get('author'))
+            try:
+                post_id = parse_id(record.get('post'))
+                comment = Comment(
+                    id=parse_id(record.get('id')),
+                    post_id=post_id,
+                    author_id=author_id,
+                    text=record.get('text') or '',
+                    created=parse_timestamp(record.get('created'), now),
+                )
+            except (TypeError, ValueError) as error:
+                self.skip(record, error)
+                continue
+            if author_id is None or post_id not in existing:
+                self.skip(record, 'неизвестный автор или пост')
+                continue
+            comments.append(comment)
+            # Те же области, что у сигнала bump_comment_caches.
+            post_author_id, group_id = existing[post_id]
+            self.scopes.add(cache.post_scope(post_id))
+            self.scopes.add(cache.author_scope(post_author_id))
+            if group_id:
+                self.scopes.add(cache.group_scope(group_id))
+        return comments
+
+    def build_follows(self, records):
+        names = [record.get(key) for record in records
+                 for key in ('user', 'author')]
+        self.users.add_missing(names)
+        follows = []
+        for record in records:
+            user_id = self.users.get(record.get('user'))
+            author_id = self.users.get(record.get('author'))
+            if user_id is None or author_id is None or user_id == author_id:
+                self.skip(record, 'неизвестный или тот же пользователь')
+                continue
+            follows.append(Follow(user_id=user_id, author_id=author_id))
+            self.scopes.add(cache.follow_scope(user_id))
+        return follows
+
+    def reconcile(self, kind, objects):
+        if not objects:
+            return
+        if kind == 'comments':
+            self.sync('sync_post_comments', posts={
+                comment.post_id for comment in objects
+            })
+            return
+        # Счётчики подписчиков нужны раньше лент: по ним решается,
+        # раскладывать ли посты автора.
+        self.sync('sync_author_stats', authors={
+            obj.author_id for obj in objects
+        })
+        if kind == 'posts':
+            first_post_dates = {}
+            for post in objects:
+                first = first_post_dates.get(post.author_id)
+                if first is None or post.pub_date < first:
+                    first_post_dates[post.author_id] = post.pub_date
+            self.stdout.write('Раскладка постов по лентам подписчиков')
+            for author_id, since in first_post_dates.items():
+                with transaction.atomic():
+                    timeline.fan_out_since(author_id, since)
+            # id новых постов bulk_create в SQLite не возвращает, поэтому
+            # варианты нарезаются по именам загруженных картинок.
+            images = {post.image.name for post in objects if post.image}
+            if images:
+                self.sync('backfill_image_variants', images=images)
+        else:
+            self.stdout.write('Заполнение лент по новым подпискам')
+            for follow in objects:
+                with transaction.atomic():
+                    timeline.backfill(follow.user_id, follow.author_id)
+
+    def sync(self, name, **options):
+        self.stdout.write(f'Запуск {name}')
+        call_command(name, stdout=self.stdout, stderr=self.stderr, **options)
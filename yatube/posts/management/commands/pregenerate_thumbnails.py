@@ -0,0 +1,67 @@
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from posts import thumbnails
+from posts.bulk import chunked
+from posts.models import Post
+
+
+def pregenerate(post):
+    return thumbnails.run(
+        post.image, thumbnails.post_scopes(post), post.pk
+    )
+
+
+def pregenerate_in_worker(post):
+    # У каждого потока пула своё соединение с базой.
+    try:
+        return pregenerate(post)
+    finally:
+        close_old_connections()
+
+
+class Command(BaseCommand):
+    help = (
+        'Нарезает варианты картинок и миниатюры всех размеров из '
+        'THUMBNAIL_PRESETS для существующих постов в --workers потоков '
+        '(0 — в текущем потоке).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--chunk-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        posts = self.get_queryset().order_by('pk').only(
+            'pk', 'image', 'author_id', 'group_id'
+        ).iterator(chunk_size=chunk_size)
+        done = failed = 0
+        with ExitStack() as stack:
+            if options['workers']:
+                pool = stack.enter_context(
+                    ThreadPoolExecutor(max_workers=options['workers'])
+                )
+                results = (
+                    pool.map(pregenerate_in_worker, chunk)
+                    for chunk in chunked(posts, chunk_size)
+                )
+            else:
+                results = (
+                    map(pregenerate, chunk)
+                    for chunk in chunked(posts, chunk_size)
+                )
+            for chunk_results in results:
+                for ok in chunk_results:
+                    done += ok
+                    failed += not ok
+                self.stdout.write(f'Обработано картинок: {done + failed}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Миниатюры готовы для {done} картинок, ошибок: {failed}'
+        ))
+
+    def get_queryset(self):
+        return Post.objects.exclude(image='')
@@ -0,0 +1,68 @@
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from posts import cache
+from posts.seed import Seeder
+
+RECONCILE = ('sync_author_stats', 'sync_post_comments', 'sync_timelines')
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет базу синтетическими пользователями, группами, постами, '
+        'комментариями и подписками со степенным распределением '
+        'популярности авторов, затем сверяет счётчики и ленты.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--comments', type=int, default=20000)
+        parser.add_argument(
+            '--exponent',
+            type=float,
+            default=1.0,
+            help='Показатель закона Ципфа для популярности авторов.',
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument(
+            '--skip-sync',
+            action='store_true',
+            help='Не сверять счётчики и ленты после заполнения.',
+        )
+
+    def handle(self, *args, **options):
+        seeder = Seeder(
+            seed=options['seed'],
+            batch_size=options['batch_size'],
+            exponent=options['exponent'],
+        )
+        user_ids = self.timed('Пользователи', seeder.users, options['users'])
+        group_ids = self.timed('Группы', seeder.groups, options['groups'])
+        post_ids = self.timed(
+            'Посты', seeder.posts, options['posts'], user_ids, group_ids
+        )
+        if post_ids:
+            self.timed(
+                'Комментарии', seeder.comments, options['comments'],
+                post_ids, user_ids,
+            )
+        self.timed('Подписки', seeder.follows, user_ids, user_ids)
+        if not options['skip_sync']:
+            for name in RECONCILE:
+                self.timed(name, call_command, name, stdout=self.stdout)
+        cache.bump(cache.ALL_POSTS)
+
+    def timed(self, title, function, *args, **kwargs):
+        started = time.monotonic()
+        result = function(*args, **kwargs)
+        elapsed = time.monotonic() - started
+        rows = f', {len(result) / elapsed:.0f} строк/с' if (
+            result is not None and elapsed
+        ) else ''
+        self.stdout.write(f'{title}: {elapsed:.1f} с{rows}')
+        return result
@@ -0,0 +1,110 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count
+
+from posts import timeline
+from posts.bulk import chunked
+from posts.models import AuthorStats, Follow, Post
+
+User = get_user_model()
+
+COUNTERS = ('posts_count', 'followers_count')
+
+
+def count_by_author(model, author_ids):
+    return dict(
+        model.objects.filter(author_id__in=author_ids)
+        .order_by()
+        .values('author_id')
+        .annotate(total=Count('id'))
+        .values_list('author_id', 'total')
+    )
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет и сверяет AuthorStats с фактическим числом постов '
+        'и подписчиков пачками по --chunk-size авторов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--authors',
+            type=int,
+            nargs='+',
+            help='Сверить только авторов с этими id.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        created = fixed = 0
+        if options['authors']:
+            chunks = chunked(sorted(options['authors']), chunk_size)
+        else:
+            chunks = self.all_authors(chunk_size)
+        for author_ids in chunks:
+            with transaction.atomic():
+                chunk_created, chunk_fixed = self.sync_chunk(author_ids)
+            created += chunk_created
+            fixed += chunk_fixed
+        self.stdout.write(self.style.SUCCESS(
+            f'Создано записей: {created}, исправлено: {fixed}'
+        ))
+
+    @staticmethod
+    def all_authors(chunk_size):
+        last_pk = 0
+        while True:
+            author_ids = list(
+                User.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not author_ids:
+                return
+            last_pk = author_ids[-1]
+            yield author_ids
+
+    def sync_chunk(self, author_ids):
+        actual = {
+            'posts_count': count_by_author(Post, author_ids),
+            'followers_count': count_by_author(Follow, author_ids),
+        }
+        stats = AuthorStats.objects.select_for_update().in_bulk(author_ids)
+        missing = [
+            AuthorStats(
+                author_id=pk,
+                **{field: actual[field].get(pk, 0) for field in COUNTERS}
+            )
+            for pk in author_ids if pk not in stats
+        ]
+        stale = []
+        for pk, row in stats.items():
+            expected = {field: actual[field].get(pk, 0) for field in COUNTERS}
+            if any(getattr(row, f) != v for f, v in expected.items()):
+                for field, value in expected.items():
+                    setattr(row, field, value)
+                stale.append(row)
+        AuthorStats.objects.bulk_create(missing)
+        AuthorStats.objects.bulk_update(stale, COUNTERS)
+        self.switch_modes(author_ids)
+        return len(missing), len(stale)
+
+    @staticmethod
+    def switch_modes(author_ids):
+        """Переключает раскладку лент по сверенным счётчикам подписчиков
+        (см. posts.timeline)."""
+        stats = AuthorStats.objects.filter(author_id__in=author_ids)
+        stats.filter(
+            pulled=False,
+            followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+        ).update(pulled=True)
+        resumed = stats.filter(
+            pulled=True,
+            followers_count__lte=settings.TIMELINE_FANOUT_RESUME_FOLLOWERS,
+        ).values_list('author_id', flat=True)
+        for author_id in list(resumed):
+            timeline.stop_pulling(author_id)
@@ -0,0 +1,75 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Max
+
+from posts.bulk import chunked
+from posts.models import Comment, Post
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет и сверяет Post.comments_count и Post.last_comment_at '
+        'пачками по --chunk-size постов.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument(
+            '--posts',
+            type=int,
+            nargs='+',
+            help='Сверить только посты с этими id.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        fixed = 0
+        if options['posts']:
+            chunks = chunked(sorted(options['posts']), chunk_size)
+        else:
+            chunks = self.all_posts(chunk_size)
+        for post_ids in chunks:
+            with transaction.atomic():
+                posts = list(
+                    Post.objects.select_for_update()
+                    .filter(pk__in=post_ids)
+                    .only('pk', 'comments_count', 'last_comment_at')
+                )
+                fixed += self.sync_chunk(posts)
+        self.stdout.write(self.style.SUCCESS(f'Исправлено постов: {fixed}'))
+
+    @staticmethod
+    def all_posts(chunk_size):
+        last_pk = 0
+        while True:
+            post_ids = list(
+                Post.objects.filter(pk__gt=last_pk)
+                .order_by('pk')
+                .values_list('pk', flat=True)[:chunk_size]
+            )
+            if not post_ids:
+                return
+            last_pk = post_ids[-1]
+            yield post_ids
+
+    def sync_chunk(self, posts):
+        actual = {
+            row['post_id']: row
+            for row in Comment.objects.filter(post__in=posts)
+            .order_by()
+            .values('post_id')
+            .annotate(total=Count('id'), last=Max('created'))
+        }
+        stale = []
+        for post in posts:
+            row = actual.get(post.pk, {'total': 0, 'last': None})
+            if (post.comments_count, post.last_comment_at) != (
+                row['total'], row['last']
+            ):
+                post.comments_count = row['total']
+                post.last_comment_at = row['last']
+                stale.append(post)
+        Post.objects.bulk_update(
+            stale, ['comments_count', 'last_comment_at']
+        )
+        return len(stale)
@@ -0,0 +1,38 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from posts import timeline
+from posts.models import Follow, TimelineEntry
+
+
+class Command(BaseCommand):
+    help = (
+        'Заполняет ленты подписок по существующим подпискам и срезает '
+        'записи сверх TIMELINE_MAX_LENGTH.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=500)
+        parser.add_argument(
+            '--trim-only',
+            action='store_true',
+            help='Только срезать старые записи, не заполняя ленты.',
+        )
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        if options['trim_only']:
+            user_ids = TimelineEntry.objects.order_by('user_id').values_list(
+                'user_id', flat=True
+            ).distinct()
+            for user_id in user_ids.iterator(chunk_size=chunk_size):
+                timeline.trim(user_id)
+        else:
+            # backfill сам срезает ленту после заполнения.
+            follows = Follow.objects.order_by('pk').values_list(
+                'user_id', 'author_id'
+            )
+            for user_id, author_id in follows.iterator(chunk_size=chunk_size):
+                with transaction.atomic():
+                    timeline.backfill(user_id, author_id)
+        self.stdout.write(self.style.SUCCESS('Ленты подписок обновлены'))
@@ -0,0 +1,74 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+
+from . import cache as page_versions
+
+
+class AnonymousPageCacheMiddleware:
+    """Кеширует целые страницы для анонимных читателей.
+
+    Кешируются только ответы представлений, объявивших свои области через
+    posts.cache.page_depends_on. Вместе с HTML сохраняются версии этих
+    областей на момент отрисовки; запись отдаётся, пока версии не
+    изменились. Запросы с cookie сессии или CSRF идут мимо кеша.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not self.is_anonymous(request):
+            return self.get_response(request)
+        key = self.cache_key(request)
+        entry = cache.get(key)
+        if entry is not None:
+            scopes, versions, status, headers, content = entry
+            if page_versions.get_versions(*scopes) == versions:
+                response = HttpResponse(content, status=status)
+                for header, value in headers:
+                    response[header] = value
+                # Сохранённый ETag совпадает с тем, что дал бы валидатор
+                # представления: версии областей не изменились.
+                return get_conditional_response(
+                    request, etag=response.get('ETag'), response=response
+                )
+        response = self.get_response(request)
+        if self.is_cacheable(request, response):
+            scopes, versions = request.page_cache_scopes
+            cache.set(
+                key,
+                (
+                    scopes,
+                    versions,
+                    response.status_code,
+                    list(response.items()),
+                    response.content,
+                ),
+                settings.ANONYMOUS_PAGE_CACHE_TIMEOUT,
+            )
+        return response
+
+    @staticmethod
+    def is_anonymous(request):
+        return request.method in ('GET', 'HEAD') and not (
+            settings.SESSION_COOKIE_NAME in request.COOKIES
+            or settings.CSRF_COOKIE_NAME in request.COOKIES
+        )
+
+    @staticmethod
+    def is_cacheable(request, response):
+        return (
+            hasattr(request, 'page_cache_scopes')
+            and response.status_code == 200
+            and not response.streaming
+            and not response.cookies
+        )
+
+    @staticmethod
+    def cache_key(request):
+        url = request.build_absolute_uri().encode()
+        return f'page:{hashlib.md5(url).hexdigest()}'
@@ -0,0 +1,22 @@
+from django.db import migrations
+
+from posts import search
+
+
+def install(apps, schema_editor):
+    search.rebuild(schema_editor.connection)
+
+
+def uninstall(apps, schema_editor):
+    search.uninstall(schema_editor.connection)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0014_post_comments_count'),
+    ]
+
+    operations = [
+        migrations.RunPython(install, uninstall),
+    ]
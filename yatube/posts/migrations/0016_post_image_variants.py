@@ -0,0 +1,18 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_post_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_variants',
+            field=models.CharField(blank=True, editable=False, help_text='Ширины и форматы, например «320.jpg 320.webp»', max_length=200, verbose_name='готовые варианты картинки'),
+        ),
+    ]
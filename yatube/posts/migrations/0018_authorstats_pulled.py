@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 02:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def mark_pulled(apps, schema_editor):
+    # До появления поля режим выводился из числа подписчиков.
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS
+    ).update(pulled=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_post_image_content_storage'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='pulled',
+            field=models.BooleanField(default=False, verbose_name='посты подмешиваются при чтении ленты'),
+        ),
+        migrations.RunPython(mark_pulled, migrations.RunPython.noop),
+    ]
@@ -1,6 +1,9 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth import get_user_model
 
+from .storage import ContentAddressedStorage
+
 
 User = get_user_model()
 
@@ -41,13 +44,45 @@ class Post(models.Model):
     image = models.ImageField(
         'Картинка',
         upload_to='posts/',
+        storage=ContentAddressedStorage(),
         blank=True
     )
+    image_variants = models.CharField(
+        verbose_name='готовые варианты картинки',
+        max_length=200,
+        blank=True,
+        editable=False,
+        help_text='Ширины и форматы, например «320.jpg 320.webp»',
+    )
+    comments_count = models.PositiveIntegerField(
+        verbose_name='число комментариев',
+        default=0,
+    )
+    last_comment_at = models.DateTimeField(
+        verbose_name='дата последнего комментария',
+        blank=True,
+        null=True,
+    )
 
     class Meta:
-        ordering = ('-pub_date',)
+        ordering = ('-pub_date', '-id')
         verbose_name = 'пост'
         verbose_name_plural = 'посты'
+        indexes = [
+            models.Index(
+                fields=['author', '-pub_date', '-id'],
+                name='post_author_date_idx',
+            ),
+            models.Index(
+                fields=['group', '-pub_date', '-id'],
+                name='post_group_date_idx',
+            ),
+            models.Index(fields=['-pub_date', '-id'], name='post_date_idx'),
+            models.Index(
+                fields=['-last_comment_at', '-id'],
+                name='post_discussed_idx',
+            ),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
@@ -75,6 +110,15 @@ class Comment(models.Model):
         auto_now_add=True,
     )
 
+    class Meta:
+        ordering = ('created', 'id')
+        indexes = [
+            models.Index(
+                fields=['post', 'created', 'id'],
+                name='comment_post_created_idx',
+            ),
+        ]
+
 
 class Follow(models.Model):
     user = models.ForeignKey(
@@ -96,6 +140,124 @@ class Follow(models.Model):
         constraints = [
             models.UniqueConstraint(fields=['user', 'author'], name='follow'),
         ]
+        indexes = [
+            models.Index(
+                fields=['author', 'user'], name='follow_author_user_idx'
+            ),
+        ]
 
     def __str__(self):
         return f'Подписка {self.user.username} на {self.author.username}'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора.
+
+    Поддерживаются сигналами Post и Follow и сверяются командой
+    sync_author_stats.
+    """
+    author = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats',
+        verbose_name='автор',
+    )
+    posts_count = models.PositiveIntegerField(
+        verbose_name='число постов',
+        default=0,
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='число подписчиков',
+        default=0,
+    )
+    pulled = models.BooleanField(
+        verbose_name='посты подмешиваются при чтении ленты',
+        default=False,
+    )
+
+    class Meta:
+        verbose_name = 'статистика автора'
+        verbose_name_plural = 'статистика авторов'
+
+    def __str__(self):
+        return f'Статистика {self.author_id}'
+
+    @classmethod
+    def posts_count_for(cls, author):
+        posts_count = cls.objects.filter(author=author).values_list(
+            'posts_count', flat=True
+        ).first()
+        if posts_count is None:
+            posts_count = cls.recount(author.pk).posts_count
+        return posts_count
+
+    @classmethod
+    def recount(cls, author_id):
+        stats, _ = cls.objects.update_or_create(
+            author_id=author_id,
+            defaults={
+                'posts_count':
+                    Post.objects.filter(author_id=author_id).count(),
+                'followers_count':
+                    Follow.objects.filter(author_id=author_id).count(),
+            },
+        )
+        return stats
+
+    @classmethod
+    def shift(cls, author_id, field, delta):
+        with transaction.atomic():
+            stats = cls.objects.filter(author_id=author_id)
+            if delta < 0:
+                stats = stats.filter(**{f'{field}__gte': -delta})
+            updated = stats.update(**{field: F(field) + delta})
+            if not updated and delta > 0:
+                cls.recount(author_id)
+
+
+class TimelineEntry(models.Model):
+    """Пост в ленте подписок читателя (fan-out при публикации).
+
+    pub_date и author копируются из поста, чтобы лента читалась и
+    чистилась по индексу без JOIN с Post.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='timeline',
+        verbose_name='читатель',
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='timeline_entries',
+        verbose_name='пост',
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+',
+        verbose_name='автор',
+    )
+    pub_date = models.DateTimeField(verbose_name='дата публикации')
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        verbose_name = 'запись ленты'
+        verbose_name_plural = 'записи ленты'
+        indexes = [
+            models.Index(
+                fields=['user', '-pub_date', '-post'],
+                name='timeline_user_date_idx',
+            ),
+            models.Index(
+                fields=['user', 'author'],
+                name='timeline_user_author_idx',
+            ),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'], name='timeline_entry'
+            ),
+        ]
@@ -1,6 +1,297 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
+import json
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db import connections
+from django.db.models import Q
+from django.utils.functional import cached_property
 
 
 def paginator(posts, NUMBER_OF_POSTS, page_number):
     paginator_obj = Paginator(posts, NUMBER_OF_POSTS)
     return paginator_obj.get_page(page_number)
+
+
+def paginate(request, posts, feed):
+    """Возвращает страницу ленты feed.
+
+    Ленты, перечисленные в settings.CURSOR_PAGINATED_FEEDS, листаются
+    курсором (?after=/?before=), остальные — номером страницы (?page=).
+    """
+    if feed in settings.CURSOR_PAGINATED_FEEDS:
+        return CursorPaginator(posts, settings.NUMBER_OF_POSTS).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    return paginator(posts, settings.NUMBER_OF_POSTS, request.GET.get('page'))
+
+
+def paginate_comments(request, comments):
+    """Очередная пачка комментариев в порядке написания (?after=)."""
+    return CursorPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=('created', 'id')
+    ).get_page(after=request.GET.get('after'))
+
+
+def estimate_rows(model, using):
+    """Число строк таблицы модели по статистике базы или None.
+
+    Для PostgreSQL это pg_class.reltuples, для SQLite — первое число в
+    sqlite_stat1 (появляется после ANALYZE).
+    """
+    connection = connections[using]
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            cursor.execute(
+                'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                [table],
+            )
+        elif connection.vendor == 'sqlite':
+            cursor.execute(
+                "SELECT 1 FROM sqlite_master WHERE name = 'sqlite_stat1'"
+            )
+            if cursor.fetchone() is None:
+                return None
+            cursor.execute(
+                'SELECT stat FROM sqlite_stat1 WHERE tbl = %s LIMIT 1',
+                [table],
+            )
+        else:
+            return None
+        row = cursor.fetchone()
+    if row is None:
+        return None
+    try:
+        return int(str(row[0]).split()[0].split('.')[0])
+    except (IndexError, ValueError):
+        return None
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator, который не считает большую таблицу целиком.
+
+    Для запроса без фильтров число строк берётся из статистики базы, если
+    она говорит о таблице больше settings.ADMIN_ESTIMATED_COUNT_MIN строк.
+    Отфильтрованные выборки считаются обычным COUNT(*) по индексам.
+    """
+
+    @cached_property
+    def count(self):
+        queryset = self.object_list
+        if not queryset.query.where:
+            estimate = estimate_rows(queryset.model, queryset.db)
+            if (
+                estimate is not None
+                and estimate >= settings.ADMIN_ESTIMATED_COUNT_MIN
+            ):
+                return estimate
+        return queryset.count()
+
+
+def page_window(number, num_pages, on_each_side=2, on_ends=1):
+    """Номера страниц для навигации: края, окрестность текущей, пропуски.
+
+    Пропуск обозначается None. Генератор выдаёт не больше
+    2 * (on_each_side + on_ends) + 3 значений, сколько бы ни было страниц,
+    поэтому page_range целиком не строится.
+    """
+    if number > on_each_side + on_ends + 2:
+        yield from range(1, on_ends + 1)
+        yield None
+        yield from range(number - on_each_side, number + 1)
+    else:
+        yield from range(1, number + 1)
+    if number < num_pages - on_each_side - on_ends - 1:
+        yield from range(number + 1, number + on_each_side + 1)
+        yield None
+        yield from range(num_pages - on_ends + 1, num_pages + 1)
+    else:
+        yield from range(number + 1, num_pages + 1)
+
+
+def encode_cursor(values):
+    """Упаковывает значения ключа сортировки в непрозрачный токен."""
+    raw = json.dumps([
+        value.isoformat() if hasattr(value, 'isoformat') else value
+        for value in values
+    ])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+BIGINT = 2 ** 63
+
+
+def decode_cursor(token):
+    """Распаковывает токен; для испорченного токена возвращает None."""
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        return None
+    return values if isinstance(values, list) else None
+
+
+def keyset_filter(ordering, values, backwards=False):
+    """Условие «строго после ключа values» для сортировки ordering.
+
+    Для ('-pub_date', '-id') это
+    pub_date < d OR (pub_date = d AND id < i);
+    при backwards=True направление сравнения меняется на обратное.
+    """
+    condition = Q()
+    for position, field in enumerate(ordering):
+        name = field.lstrip('-')
+        lookup = 'lt' if field.startswith('-') != backwards else 'gt'
+        step = Q(**{f'{name}__{lookup}': values[position]})
+        for previous, value in zip(ordering[:position], values):
+            step &= Q(**{previous.lstrip('-'): value})
+        condition |= step
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(
+        field[1:] if field.startswith('-') else f'-{field}'
+        for field in ordering
+    )
+
+
+def keyset_slice(queryset, ordering, values, backwards, limit):
+    """Первые limit строк queryset после ключа values.
+
+    values=None означает начало ленты; backwards=True — идти в обратную
+    сторону (строки возвращаются в обратном порядке).
+    """
+    if backwards:
+        queryset = queryset.order_by(*reverse_ordering(ordering))
+    else:
+        queryset = queryset.order_by(*ordering)
+    if values is not None:
+        queryset = queryset.filter(keyset_filter(ordering, values, backwards))
+    return queryset[:limit]
+
+
+class CursorPage(Page):
+    """Страница keyset-пагинатора.
+
+    Номера страницы у неё нет: соседние страницы адресуются токенами
+    next_cursor и previous_cursor.
+    """
+    cursor_pagination = True
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None, direction='after'):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+        self.direction = direction
+
+    def __repr__(self):
+        # Строка входит в ключ {% cache %} ленты: ?after= и ?before= с
+        # одним токеном — разные страницы.
+        if not self.cursor:
+            return '<Page first>'
+        return f'<Page {self.direction}:{self.cursor}>'
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator(Paginator):
+    """Keyset-пагинатор без COUNT(*) и OFFSET.
+
+    Каждая страница — один запрос LIMIT per_page + 1 с условием на ключ
+    сортировки, поэтому глубокие страницы отдаются так же быстро, как
+    первая. ordering должен однозначно упорядочивать строки, то есть
+    заканчиваться уникальным полем.
+
+    Кроме QuerySet принимает объекты с атрибутом model и методом
+    keyset_slice(ordering, values, backwards, limit) — например,
+    составную ленту подписок.
+    """
+
+    def __init__(self, object_list, per_page,
+                 ordering=('-pub_date', '-id')):
+        super().__init__(object_list, per_page)
+        self.ordering = tuple(ordering)
+
+    def get_page(self, after=None, before=None):
+        if after:
+            values = self._values(after)
+            if values is not None:
+                return self._page_after(values, after)
+        if before:
+            values = self._values(before)
+            if values is not None:
+                return self._page_before(values, before)
+        return self._page_after(None, None)
+
+    def _values(self, token):
+        values = decode_cursor(token)
+        if values is None or len(values) != len(self.ordering):
+            return None
+        # Токен приходит от клиента: в нём может оказаться что угодно из
+        # JSON, а не только строки дат и числа в пределах BIGINT.
+        if not all(
+            isinstance(value, str)
+            or type(value) is int and -BIGINT <= value < BIGINT
+            for value in values
+        ):
+            return None
+        model = self.object_list.model
+        try:
+            return [
+                model._meta.get_field(field.lstrip('-')).to_python(value)
+                for field, value in zip(self.ordering, values)
+            ]
+        except (ValidationError, TypeError, ValueError):
+            return None
+
+    def _key(self, item):
+        if isinstance(item, dict):
+            # Строки .values(): поля ключа должны быть среди выбранных.
+            return [item[field.lstrip('-')] for field in self.ordering]
+        return [getattr(item, field.lstrip('-')) for field in self.ordering]
+
+    def _fetch(self, values, backwards):
+        args = (self.ordering, values, backwards, self.per_page + 1)
+        if hasattr(self.object_list, 'keyset_slice'):
+            items = list(self.object_list.keyset_slice(*args))
+        else:
+            items = list(keyset_slice(self.object_list, *args))
+        return items[:self.per_page], len(items) > self.per_page
+
+    def _page_after(self, values, cursor):
+        items, has_more = self._fetch(values, backwards=False)
+        next_cursor = previous_cursor = None
+        if has_more:
+            next_cursor = encode_cursor(self._key(items[-1]))
+        if cursor and items:
+            previous_cursor = encode_cursor(self._key(items[0]))
+        return CursorPage(items, self, cursor, next_cursor, previous_cursor)
+
+    def _page_before(self, values, cursor):
+        items, has_more = self._fetch(values, backwards=True)
+        if not has_more:
+            # Дошли до начала ленты: отдаём полную первую страницу.
+            return self._page_after(None, None)
+        items.reverse()
+        return CursorPage(
+            items,
+            self,
+            cursor,
+            next_cursor=encode_cursor(self._key(items[-1])),
+            previous_cursor=encode_cursor(self._key(items[0])),
+            direction='before',
+        )
@@ -0,0 +1,176 @@
+"""Полнотекстовый поиск по постам на SQLite FTS5.
+
+Индекс posts_post_fts хранит только токены: текст берётся из posts_post
+(external content), а синхронизацию держат триггеры на вставку, удаление
+и изменение text. SQLite пересоздаёт таблицу при некоторых миграциях и
+теряет её триггеры, поэтому ensure_triggers вызывается после каждого
+migrate.
+"""
+from django.db import connection
+from django.utils.html import escape
+
+from .paginator import CursorPaginator, decode_cursor
+
+FTS_TABLE = 'posts_post_fts'
+
+# Управляющие символы вместо тегов: snippet() не экранирует текст, поэтому
+# разметка подставляется уже после escape().
+MARK_START, MARK_END = '\x02', '\x03'
+
+CREATE_TABLE = (
+    f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+    "text, content='posts_post', content_rowid='id', "
+    "tokenize='unicode61 remove_diacritics 2')"
+)
+TRIGGERS = (
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai '
+    'AFTER INSERT ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad '
+    'AFTER DELETE ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    'END',
+    f'CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au '
+    'AFTER UPDATE OF text ON posts_post BEGIN '
+    f'INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) '
+    "VALUES ('delete', old.id, old.text); "
+    f'INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); '
+    'END',
+)
+DROP = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(CREATE_TABLE)
+        for sql in TRIGGERS:
+            cursor.execute(sql)
+
+
+def uninstall(using=connection):
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for sql in DROP:
+            cursor.execute(sql)
+
+
+def ensure_triggers(using=connection):
+    if (
+        is_available(using)
+        and FTS_TABLE in using.introspection.table_names()
+    ):
+        install(using)
+
+
+def rebuild(using=connection):
+    install(using)
+    with using.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+        )
+
+
+def match_expression(query):
+    """Превращает пользовательский ввод в безопасное выражение MATCH.
+
+    Каждое слово берётся в кавычки (операторы FTS5 не срабатывают), слова
+    объединяются через AND, последнее ищется по префиксу.
+    """
+    words = [
+        '"{}"'.format(word.replace('"', '""')) for word in query.split()
+    ]
+    if words:
+        words[-1] += '*'
+    return ' '.join(words)
+
+
+def matching_ids_sql(query):
+    """Подзапрос с id постов, подходящих под query, для фильтра pk__in."""
+    return (
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s',
+        [match_expression(query)],
+    )
+
+
+def highlight(snippet):
+    return (
+        escape(snippet)
+        .replace(MARK_START, '<mark>')
+        .replace(MARK_END, '</mark>')
+    )
+
+
+def search_rows(query, values=None, backwards=False, limit=10):
+    """Строки (id, rank, snippet) по возрастанию bm25 (лучшие сначала).
+
+    values — ключ (rank, id), после которого продолжать выдачу.
+    """
+    rank = f'bm25({FTS_TABLE})'
+    sql = (
+        f'SELECT rowid, {rank}, '
+        f"snippet({FTS_TABLE}, 0, '{MARK_START}', '{MARK_END}', '…', 24) "
+        f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+    )
+    params = [match_expression(query)]
+    compare = '<' if backwards else '>'
+    if values is not None:
+        sql += (
+            f' AND ({rank} {compare} %s '
+            f'OR ({rank} = %s AND rowid {compare} %s))'
+        )
+        params += [values[0], values[0], values[1]]
+    direction = 'DESC' if backwards else 'ASC'
+    sql += f' ORDER BY {rank} {direction}, rowid {direction} LIMIT %s'
+    params.append(limit)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.fetchall()
+
+
+class SearchPaginator(CursorPaginator):
+    """Курсорная выдача поиска, упорядоченная по релевантности.
+
+    Ключ страницы — (rank, id); посты для найденных id подгружаются одним
+    запросом из object_list.
+    """
+
+    def __init__(self, object_list, per_page, query):
+        super().__init__(object_list, per_page, ordering=('rank', 'id'))
+        self.query = query
+
+    def _values(self, token):
+        values = decode_cursor(token)
+        try:
+            rank, post_id = values
+            return [float(rank), int(post_id)]
+        except (TypeError, ValueError):
+            return None
+
+    def _key(self, item):
+        return [item.search_rank, item.pk]
+
+    def _fetch(self, values, backwards):
+        rows = search_rows(self.query, values, backwards, self.per_page + 1)
+        posts = self.object_list.in_bulk([row[0] for row in rows])
+        items = []
+        for post_id, rank, snippet in rows:
+            post = posts.get(post_id)
+            if post is not None:
+                post.search_rank = rank
+                post.snippet = highlight(snippet)
+                items.append(post)
+        return items[:self.per_page], len(rows) > self.per_page
@@ -0,0 +1,180 @@
+"""Синтетические данные в объёме продакшена для нагрузочных замеров.
+
+Все строки пишутся bulk_create пачками с явными id подряд после
+текущего максимума, так что созданные записи не нужно перечитывать.
+Популярность авторов распределена по закону Ципфа: вес автора с рангом r
+равен 1 / r ** exponent. По этим весам выбираются и авторы постов, и
+цели подписок, а число подписок читателя берётся из распределения
+Парето. Получается граф, где у немногих авторов тысячи подписчиков, а у
+большинства почти никого.
+
+Сигналы при bulk_create не срабатывают: счётчики, ленты и кеши сверяются
+командами sync_* после заполнения (см. команду seed_yatube).
+"""
+import itertools
+import random
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+
+from .bulk import (bulk_insert, chunked, explicit_auto_now_add,
+                   reset_sequences)
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Из стольких заранее сгенерированных фраз собираются тексты: Faker на
+# каждый из миллиона постов работал бы дольше самой вставки.
+PHRASES = 500
+# По столько id постов читаются их даты: меньше предела переменных SQLite.
+DATES_CHUNK = 500
+
+
+def next_id(model):
+    return (model.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+
+class Seeder:
+    def __init__(self, seed=0, batch_size=1000, days=365, exponent=1.0):
+        self.random = random.Random(seed)
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(seed)
+        self.batch_size = batch_size
+        self.days = days
+        self.exponent = exponent
+        self.now = timezone.now()
+        self.phrases = [self.fake.sentence() for _ in range(PHRASES)]
+
+    def text(self, sentences):
+        return ' '.join(self.random.choices(self.phrases, k=sentences))
+
+    def popularity(self, ids):
+        """Накопленные веса Ципфа для random.choices(cum_weights=…)."""
+        return list(itertools.accumulate(
+            1 / rank ** self.exponent for rank in range(1, len(ids) + 1)
+        ))
+
+    def insert(self, model, objects):
+        for chunk in chunked(objects, self.batch_size * 10):
+            with transaction.atomic():
+                bulk_insert(
+                    model, chunk, self.batch_size,
+                    ignore_conflicts=model is Follow,
+                )
+
+    def users(self, amount):
+        start = next_id(User)
+        password = make_password(None)
+        self.insert(User, (
+            User(
+                id=pk,
+                username=f'{self.fake.user_name()}_{pk}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            ) for pk in range(start, start + amount)
+        ))
+        reset_sequences(User)
+        return range(start, start + amount)
+
+    def groups(self, amount):
+        start = next_id(Group)
+        self.insert(Group, (
+            Group(
+                id=pk,
+                title=f'{self.fake.word().capitalize()} {pk}',
+                slug=f'group-{pk}',
+                description=self.text(2),
+            ) for pk in range(start, start + amount)
+        ))
+        reset_sequences(Group)
+        return range(start, start + amount)
+
+    def pub_date(self, position, amount):
+        """Дата поста номер position из amount: равномерно за days дней."""
+        span = timedelta(days=self.days)
+        offset = (position + self.random.random()) / amount
+        return self.now - span + span * offset
+
+    def posts(self, amount, author_ids, group_ids):
+        start = next_id(Post)
+        weights = self.popularity(author_ids)
+        groups = list(group_ids) + [None]
+
+        def build():
+            for position in range(amount):
+                yield Post(
+                    id=start + position,
+                    author_id=self.random.choices(
+                        author_ids, cum_weights=weights
+                    )[0],
+                    group_id=self.random.choice(groups),
+                    text=self.text(self.random.randint(1, 8)),
+                    pub_date=self.pub_date(position, amount),
+                )
+
+        with explicit_auto_now_add(Post, 'pub_date'):
+            self.insert(Post, build())
+        reset_sequences(Post)
+        return range(start, start + amount)
+
+    def pub_dates(self, post_ids):
+        """Настоящие даты постов post_ids в том же порядке."""
+        dates = []
+        for chunk in chunked(post_ids, DATES_CHUNK):
+            known = dict(
+                Post.objects.filter(pk__in=chunk).values_list(
+                    'pk', 'pub_date'
+                )
+            )
+            dates.extend(known[pk] for pk in chunk)
+        return dates
+
+    def comments(self, amount, post_ids, user_ids):
+        start = next_id(Comment)
+        dates = self.pub_dates(post_ids)
+
+        def build():
+            for pk in range(start, start + amount):
+                position = self.random.randrange(len(post_ids))
+                # Комментарий пишется после поста, но до «сейчас».
+                published = dates[position]
+                yield Comment(
+                    id=pk,
+                    post_id=post_ids[position],
+                    author_id=self.random.choice(user_ids),
+                    text=self.text(self.random.randint(1, 3)),
+                    created=published + (self.now - published) * (
+                        self.random.random()
+                    ),
+                )
+
+        with explicit_auto_now_add(Comment, 'created'):
+            self.insert(Comment, build())
+        reset_sequences(Comment)
+        return range(start, start + amount)
+
+    def follows(self, user_ids, author_ids, alpha=1.5, limit=1000):
+        """Подписки читателей user_ids на авторов author_ids.
+
+        Число подписок читателя — Парето(alpha), не больше limit; на кого
+        подписаться, выбирается по весам Ципфа.
+        """
+        weights = self.popularity(author_ids)
+
+        def build():
+            for user_id in user_ids:
+                amount = min(limit, int(self.random.paretovariate(alpha)))
+                authors = set(self.random.choices(
+                    author_ids, cum_weights=weights, k=amount
+                ))
+                authors.discard(user_id)
+                for author_id in authors:
+                    yield Follow(user_id=user_id, author_id=author_id)
+
+        self.insert(Follow, build())
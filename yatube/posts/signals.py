@@ -0,0 +1,160 @@
+import threading
+
+from django.db.models import F, OuterRef, Subquery
+from django.db.models.functions import Greatest
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import cache, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post
+
+_local = threading.local()
+
+
+def deleting_posts():
+    """Посты, которые удаляются в этом потоке прямо сейчас.
+
+    Их комментарии уходят каскадом: пересчитывать счётчики и сбрасывать
+    кеш по каждому незачем, это сделают обработчики самого поста.
+    """
+    if not hasattr(_local, 'deleting_posts'):
+        _local.deleting_posts = set()
+    return _local.deleting_posts
+
+
+@receiver(post_save, sender=Post)
+def count_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.shift(instance.author_id, 'posts_count', 1)
+
+
+@receiver(post_save, sender=Post)
+def fan_out_created_post(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        timeline.fan_out(instance)
+
+
+@receiver(post_save, sender=Post)
+def schedule_post_thumbnails(sender, instance, raw=False, update_fields=None,
+                             **kwargs):
+    if raw or (update_fields is not None and 'image' not in update_fields):
+        return
+    # Прежний файл не удаляется здесь: на него может ссылаться пост
+    # параллельной загрузки, ещё не закоммиченный. Его уберёт gc_media.
+    saved_image = getattr(instance, '_saved_image', None)
+    if instance.image_variants and saved_image != instance.image.name:
+        # Варианты остались от прежней картинки.
+        instance.image_variants = ''
+        Post.objects.filter(pk=instance.pk).update(image_variants='')
+    thumbnails.schedule(instance)
+
+
+@receiver(post_delete, sender=Post)
+def count_deleted_post(sender, instance, **kwargs):
+    AuthorStats.shift(instance.author_id, 'posts_count', -1)
+
+
+@receiver(post_save, sender=Follow)
+def backfill_timeline(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.shift(instance.author_id, 'followers_count', 1)
+        timeline.start_pulling(instance.author_id)
+        timeline.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Follow)
+def prune_timeline(sender, instance, **kwargs):
+    AuthorStats.shift(instance.author_id, 'followers_count', -1)
+    timeline.prune(instance.user_id, instance.author_id)
+    timeline.stop_pulling(instance.author_id)
+
+
+@receiver(pre_save, sender=Post)
+def remember_saved_post(sender, instance, raw=False, **kwargs):
+    instance._saved_group_id = instance._saved_image = None
+    if instance.pk and not raw:
+        instance._saved_group_id, instance._saved_image = (
+            Post.objects.filter(pk=instance.pk).values_list(
+                'group_id', 'image'
+            ).first() or (None, None)
+        )
+
+
+@receiver(post_save, sender=Post)
+@receiver(post_delete, sender=Post)
+def bump_post_caches(sender, instance, **kwargs):
+    scopes = {
+        cache.ALL_POSTS,
+        cache.author_scope(instance.author_id),
+        cache.post_scope(instance.pk),
+    }
+    for group_id in (
+        instance.group_id, getattr(instance, '_saved_group_id', None)
+    ):
+        if group_id:
+            scopes.add(cache.group_scope(group_id))
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Comment)
+def count_created_comment(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        Post.objects.filter(pk=instance.post_id).update(
+            comments_count=F('comments_count') + 1,
+            last_comment_at=instance.created,
+        )
+
+
+@receiver(pre_delete, sender=Post)
+def remember_deleting_post(sender, instance, **kwargs):
+    deleting_posts().add(instance.pk)
+
+
+@receiver(post_delete, sender=Post)
+def forget_deleted_post(sender, instance, **kwargs):
+    deleting_posts().discard(instance.pk)
+
+
+@receiver(post_delete, sender=Comment)
+def count_deleted_comment(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    cache.bump(cache.ALL_COMMENTS)
+    Post.objects.filter(pk=instance.post_id).update(
+        comments_count=Greatest(F('comments_count') - 1, 0),
+        last_comment_at=Subquery(
+            Comment.objects.filter(post=OuterRef('pk'))
+            .order_by('-created')
+            .values('created')[:1]
+        ),
+    )
+
+
+@receiver(post_save, sender=Comment)
+@receiver(post_delete, sender=Comment)
+def bump_comment_caches(sender, instance, **kwargs):
+    if instance.post_id in deleting_posts():
+        return
+    # Число комментариев видно в карточках ленты автора и группы; главная
+    # и лента подписок зависят от областей своих постов.
+    post = Post.objects.filter(pk=instance.post_id).values(
+        'author_id', 'group_id'
+    ).first()
+    scopes = [cache.post_scope(instance.post_id)]
+    if post is not None:
+        scopes.append(cache.author_scope(post['author_id']))
+        if post['group_id']:
+            scopes.append(cache.group_scope(post['group_id']))
+    cache.bump(*scopes)
+
+
+@receiver(post_save, sender=Group)
+def bump_group_caches(sender, instance, **kwargs):
+    cache.bump(cache.ALL_POSTS, cache.group_scope(instance.pk))
+
+
+@receiver(post_save, sender=Follow)
+@receiver(post_delete, sender=Follow)
+def bump_follow_caches(sender, instance, **kwargs):
+    cache.bump(cache.follow_scope(instance.user_id))
@@ -0,0 +1,45 @@
+import hashlib
+import os
+
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Хранилище, в котором имя файла — sha256 его содержимого.
+
+    posts/cat.jpg сохраняется как posts/3f/3fa2…e1.jpg; повторная загрузка
+    того же файла ничего не пишет и возвращает уже существующее имя, так что
+    одинаковые картинки делят один файл, его варианты и миниатюры. Файлы,
+    на которые не ссылается ни один пост, удаляет команда gc_media.
+    """
+
+    def content_name(self, name, content):
+        digest = hashlib.sha256()
+        for chunk in content.chunks():
+            digest.update(chunk)
+        digest = digest.hexdigest()
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        return os.path.join(directory, digest[:2], digest + extension)
+
+    def _save(self, name, content):
+        return self._write(self.content_name(name, content), content)
+
+    def save_derived(self, name, content):
+        """Сохраняет производный файл (вариант картинки) точно под name."""
+        return self._write(name, content)
+
+    def _write(self, name, content):
+        if self.exists(name):
+            # Повторная загрузка продлевает файлу отсрочку gc_media
+            # (--min-age): пост с этой картинкой может быть ещё не
+            # закоммичен.
+            os.utime(self.path(name))
+            return name
+        saved = super()._save(name, content)
+        if saved != name:
+            # Тот же файл параллельно записал другой запрос.
+            self.delete(saved)
+        return name
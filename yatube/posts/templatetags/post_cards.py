@@ -0,0 +1,56 @@
+from django import template
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+from posts import thumbnails
+from posts.cache import get_versions, post_scope
+
+register = template.Library()
+
+
+def card_key(post, version):
+    return f'card:{post.pk}:{version}'
+
+
+@register.simple_tag
+def prefetch_card_versions(posts):
+    """Готовит карточки всей страницы пачками до цикла шаблона.
+
+    Версии и HTML карточек читаются из кеша двумя get_many, а записи о
+    миниатюрах для карточек, которых в кеше нет, — одним prefetch.
+    """
+    posts = list(posts)
+    versions = get_versions(*(post_scope(post.pk) for post in posts))
+    for post, version in zip(posts, versions):
+        post.card_version = version
+    cards = cache.get_many(
+        [card_key(post, post.card_version) for post in posts]
+    )
+    stale = []
+    for post in posts:
+        post.card_html = cards.get(card_key(post, post.card_version))
+        if post.card_html is None:
+            stale.append(post)
+    thumbnails.prefetch_thumbnails(stale, 'card')
+    return ''
+
+
+@register.simple_tag
+def post_card(post):
+    """Карточка поста без ссылок, зависящих от читателя.
+
+    HTML кешируется по посту и его версии и переиспользуется всеми лентами.
+    """
+    version = getattr(post, 'card_version', None)
+    if version is None:
+        version, = get_versions(post_scope(post.pk))
+        html = cache.get(card_key(post, version))
+    else:
+        html = post.card_html
+    key = card_key(post, version)
+    if html is None:
+        html = render_to_string('includes/pub_card_body.html', {'post': post})
+        cache.set(key, html, settings.CARD_CACHE_TIMEOUT)
+    return mark_safe(html)
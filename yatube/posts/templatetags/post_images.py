@@ -0,0 +1,38 @@
+from django import template
+from django.conf import settings
+
+from posts import images, thumbnails
+
+register = template.Library()
+
+
+@register.inclusion_tag('includes/post_image.html')
+def post_image(post, preset='card'):
+    """Картинка поста: варианты для srcset, если они нарезаны, иначе
+    миниатюра sorl, иначе заглушка, пока картинка в очереди."""
+    width, height = thumbnails.preset(preset)[0].split('x')
+    context = {
+        'post': post,
+        'width': width,
+        'height': height,
+        'sizes': settings.IMAGE_VARIANT_SIZES,
+    }
+    if not post.image:
+        return context
+    if post.image_variants:
+        urls = images.variant_urls(post.image, post.image_variants)
+        if 'jpg' in urls:
+            context['sources'] = [
+                (images.FORMATS[extension][1], images.srcset(urls[extension]))
+                for extension in urls if extension != 'jpg'
+            ]
+            context['srcset'] = images.srcset(urls['jpg'])
+            context['src'] = next(
+                (url for w, url in urls['jpg'] if w >= int(width)),
+                urls['jpg'][-1][1],
+            )
+            return context
+    context['thumbnail'] = thumbnails.ready_thumbnail(post.image, preset)
+    if context['thumbnail'] is None:
+        thumbnails.schedule(post)
+    return context
@@ -0,0 +1,32 @@
+from django import template
+from django.http import QueryDict
+
+from posts.paginator import page_window
+
+register = template.Library()
+
+
+@register.simple_tag
+def page_numbers(page_obj, on_each_side=2, on_ends=1):
+    return page_window(
+        page_obj.number,
+        page_obj.paginator.num_pages,
+        on_each_side,
+        on_ends,
+    )
+
+
+@register.simple_tag(takes_context=True)
+def page_url(context, **params):
+    """Строка запроса со ссылкой на другую страницу той же выдачи.
+
+    Сохраняет прочие параметры (например, ?q= поиска) и сбрасывает
+    старые page/after/before.
+    """
+    request = context.get('request')
+    query = request.GET.copy() if request else QueryDict(mutable=True)
+    for key in ('page', 'after', 'before'):
+        query.pop(key, None)
+    for key, value in params.items():
+        query[key] = value
+    return f'?{query.urlencode()}'
@@ -0,0 +1,229 @@
+import gzip
+import json
+import os
+import tempfile
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db.models import F
+from django.test import TestCase
+
+from .. import cache as page_versions
+from ..management.commands import import_yatube
+from ..models import AuthorStats, Comment, Follow, Group, Post, TimelineEntry
+
+User = get_user_model()
+
+
+class ImportCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+
+    def load(self, kind, content, suffix='.jsonl', **options):
+        with tempfile.NamedTemporaryFile(
+            'w', suffix=suffix, encoding='utf-8', delete=False
+        ) as file:
+            file.write(content)
+        self.addCleanup(os.remove, file.name)
+        stdout = StringIO()
+        call_command(
+            'import_yatube', kind, file.name, chunk_size=2, batch_size=1,
+            stdout=stdout, stderr=StringIO(), **options
+        )
+        return stdout.getvalue()
+
+    def test_import_posts_comments_and_follows(self):
+        """Проверяем загрузку постов с датой из файла и без неё,
+        комментариев и подписок со сверкой счётчиков и лент."""
+        output = self.load('posts', (
+            '{"id": 100, "author": "author", "text": "Старый", '
+            '"group": "group", "pub_date": "2020-01-02T03:04:05"}\n'
+            '{"id": 101, "author": "author", "text": "Свежий"}\n'
+            '{"author": "nobody", "text": "Пропущенный"}\n'
+        ))
+        self.assertIn('Загружено: 2, пропущено: 1', output)
+        self.assertIn('строк/с', output)
+        old, fresh = Post.objects.get(pk=100), Post.objects.get(pk=101)
+        self.assertEqual(old.pub_date.year, 2020)
+        self.assertEqual(old.group, self.group)
+        self.assertGreater(fresh.pub_date, old.pub_date)
+        self.assertTrue(Post._meta.get_field('pub_date').auto_now_add)
+        self.assertEqual(AuthorStats.posts_count_for(self.author), 2)
+
+        self.load('comments', (
+            'post,author,text,created\n'
+            '100,reader,Первый,2020-01-03T00:00:00\n'
+            '100,reader,Второй,\n'
+            '999,reader,К несуществующему,\n'
+        ), suffix='.csv')
+        old.refresh_from_db()
+        self.assertEqual(old.comments_count, 2)
+
+        self.load('follows', (
+            '{"user": "reader", "author": "author"}\n'
+            '{"user": "reader", "author": "author"}\n'
+        ))
+        self.assertEqual(Follow.objects.filter(user=self.reader).count(), 1)
+        self.assertEqual(
+            TimelineEntry.objects.filter(user=self.reader).count(), 2
+        )
+
+    def test_sync_touches_only_imported_rows(self):
+        """Проверяем, что после загрузки сверяются только затронутые
+        авторы и ленты, а комментарии сбрасывают кеш автора и группы."""
+        other = User.objects.create_user(username='other')
+        Post.objects.create(author=other, text='Чужой')
+        AuthorStats.objects.filter(author=other).update(posts_count=42)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.load('posts', (
+            '{"id": 100, "author": "author", "text": "Пост", '
+            '"group": "group"}\n'
+        ))
+        self.assertEqual(AuthorStats.posts_count_for(self.author), 1)
+        self.assertEqual(AuthorStats.posts_count_for(other), 42)
+        self.assertTrue(
+            TimelineEntry.objects.filter(user=self.reader, post_id=100)
+        )
+        scopes = (
+            page_versions.author_scope(self.author.pk),
+            page_versions.group_scope(self.group.pk),
+        )
+        before = page_versions.get_versions(*scopes)
+        self.load('comments', '{"post": 100, "author": "reader"}\n')
+        after = page_versions.get_versions(*scopes)
+        self.assertTrue(all(new != old for new, old in zip(after, before)))
+
+    def test_each_chunk_is_reconciled_with_its_own_rows(self):
+        """Проверяем, что сверка идёт после каждой пачки и нарезка
+        вариантов картинок получает только загруженные файлы."""
+        Post.objects.create(
+            author=self.author, text='Старый', image='posts/old.png'
+        )
+        with mock.patch.object(import_yatube, 'call_command') as sync:
+            self.load('posts', (
+                '{"author": "author", "image": "posts/a.png"}\n'
+                '{"author": "author"}\n'
+                '{"author": "author", "image": "posts/b.png"}\n'
+            ))
+        calls = [(c.args[0], c.kwargs) for c in sync.call_args_list]
+        self.assertEqual(
+            [name for name, _ in calls],
+            ['sync_author_stats', 'backfill_image_variants'] * 2,
+        )
+        self.assertEqual(
+            [options['images'] for name, options in calls
+             if name == 'backfill_image_variants'],
+            [{'posts/a.png'}, {'posts/b.png'}],
+        )
+
+    def test_create_missing_authors_and_groups(self):
+        """Проверяем, что неизвестные авторы и группы создаются по
+        флагу."""
+        self.load('posts', (
+            '{"author": "newcomer", "group": "new-group", "text": "Пост"}\n'
+        ), create_missing=True, skip_sync=True)
+        post = Post.objects.get(text='Пост')
+        self.assertEqual(post.author.username, 'newcomer')
+        self.assertFalse(post.author.has_usable_password())
+        self.assertEqual(post.group.slug, 'new-group')
+
+
+class ExportCommandTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.posts = [
+            Post.objects.create(
+                author=cls.author, text=f'Пост {i}', group=cls.group
+            ) for i in range(5)
+        ]
+
+    def export(self, suffix, **options):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(os.rmdir, directory)
+        path = os.path.join(directory, f'posts{suffix}')
+        self.addCleanup(os.remove, path)
+        stdout = StringIO()
+        call_command(
+            'export_yatube', 'posts', output=path, chunk_size=2,
+            stdout=stdout, **options
+        )
+        self.assertIn('Выгружено строк: 5', stdout.getvalue())
+        return path
+
+    def test_gzip_export_reads_all_rows_in_key_order(self):
+        """Проверяем, что сжатая выгрузка содержит все посты по
+        порядку ключа."""
+        with gzip.open(self.export('.jsonl.gz'), 'rt') as file:
+            rows = [json.loads(line) for line in file]
+        self.assertEqual(
+            [row['id'] for row in rows], [post.pk for post in self.posts]
+        )
+        self.assertEqual(rows[0]['author'], 'author')
+        self.assertEqual(rows[0]['group'], 'group')
+
+    def test_export_round_trips_through_import(self):
+        """Проверяем, что выгрузку CSV можно загрузить обратно."""
+        path = self.export('.csv')
+        Post.objects.all().delete()
+        call_command(
+            'import_yatube', 'posts', path, stdout=StringIO(),
+            stderr=StringIO(),
+        )
+        self.assertEqual(
+            list(Post.objects.order_by('pk').values_list('pk', 'pub_date')),
+            [(post.pk, post.pub_date) for post in self.posts],
+        )
+
+
+class SeedCommandTest(TestCase):
+    def test_seed_builds_consistent_power_law_data(self):
+        """Проверяем, что заполнение создаёт данные со сверенными
+        счётчиками и неравномерным графом подписок."""
+        call_command(
+            'seed_yatube', users=50, groups=3, posts=300, comments=200,
+            stdout=StringIO(),
+        )
+        self.assertEqual(User.objects.count(), 50)
+        self.assertEqual(Post.objects.count(), 300)
+        self.assertEqual(Comment.objects.count(), 200)
+        post = Post.objects.order_by('-comments_count').first()
+        self.assertEqual(post.comments_count, post.comments.count())
+        self.assertFalse(
+            Comment.objects.filter(created__lt=F('post__pub_date'))
+        )
+        for author in User.objects.all()[:5]:
+            self.assertEqual(
+                AuthorStats.posts_count_for(author), author.posts.count()
+            )
+        followers = sorted(
+            (stats.followers_count for stats in AuthorStats.objects.all()),
+            reverse=True,
+        )
+        self.assertGreater(followers[0], followers[len(followers) // 2])
+
+    def test_bench_views_reports_every_url(self):
+        """Проверяем, что замер проходит по всем адресам и откатывает
+        данные."""
+        stdout = StringIO()
+        call_command(
+            'bench_views', scales=[100], repeat=2, stdout=stdout
+        )
+        output = stdout.getvalue()
+        for name in ('posts:index', 'posts:follow_index', 'posts:search'):
+            with self.subTest(name=name):
+                self.assertRegex(output, name + r' +200 ')
+        self.assertIn('posts:add_comment', output)
+        self.assertFalse(Post.objects.exists())
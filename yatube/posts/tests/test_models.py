@@ -1,7 +1,12 @@
+from io import StringIO
+
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 
-from ..models import Group, Post
+from ..models import AuthorStats, Comment, Group, Post
 
 User = get_user_model()
 
@@ -56,3 +61,104 @@ class PostModelTest(TestCase):
             with self.subTest(value=value):
                 self.assertEqual(
                     post._meta.get_field(value).help_text, expected)
+
+
+class AuthorStatsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    def test_posts_count_follows_create_and_delete(self):
+        """Проверяем, что счётчик постов меняется при создании и удалении
+        поста."""
+        posts = [
+            Post.objects.create(author=self.user, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.assertEqual(AuthorStats.posts_count_for(self.user), 3)
+        posts[0].delete()
+        self.assertEqual(AuthorStats.posts_count_for(self.user), 2)
+
+    def test_posts_count_read_is_single_query(self):
+        """Проверяем, что чтение счётчика не считает посты заново."""
+        Post.objects.create(author=self.user, text='Пост')
+        with self.assertNumQueries(1):
+            AuthorStats.posts_count_for(self.user)
+
+    def test_sync_author_stats_reconciles(self):
+        """Проверяем, что команда исправляет разошедшийся счётчик."""
+        Post.objects.create(author=self.user, text='Пост')
+        Post.objects.bulk_create(
+            Post(author=self.user, text=f'Пост {i}') for i in range(4)
+        )
+        call_command('sync_author_stats', chunk_size=1, stdout=StringIO())
+        self.assertEqual(
+            AuthorStats.objects.get(author=self.user).posts_count, 5
+        )
+
+
+class PostCommentsCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(author=cls.user, text='Пост')
+
+    def test_counters_follow_comments(self):
+        """Проверяем, что число комментариев и дата последнего
+        обновляются при добавлении и удалении комментария."""
+        first = Comment.objects.create(
+            post=self.post, author=self.user, text='Первый'
+        )
+        second = Comment.objects.create(
+            post=self.post, author=self.user, text='Второй'
+        )
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 2)
+        self.assertEqual(self.post.last_comment_at, second.created)
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 1)
+        self.assertEqual(self.post.last_comment_at, first.created)
+
+    def test_decrement_does_not_go_below_zero(self):
+        """Проверяем, что удаление комментария при нулевом счётчике
+        оставляет ноль и всё равно пересчитывает дату последнего."""
+        first = Comment.objects.create(
+            post=self.post, author=self.user, text='Первый'
+        )
+        second = Comment.objects.create(
+            post=self.post, author=self.user, text='Второй'
+        )
+        Post.objects.filter(pk=self.post.pk).update(comments_count=0)
+        second.delete()
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 0)
+        self.assertEqual(self.post.last_comment_at, first.created)
+
+    def test_post_delete_does_not_grow_with_comments(self):
+        """Проверяем, что удаление поста не пересчитывает счётчики по
+        каждому удаляемому каскадом комментарию."""
+        queries = []
+        for amount in (1, 5):
+            post = Post.objects.create(author=self.user, text='Пост')
+            for i in range(amount):
+                Comment.objects.create(
+                    post=post, author=self.user, text=f'Текст {i}'
+                )
+            with CaptureQueriesContext(connection) as captured:
+                post.delete()
+            queries.append(len(captured))
+        self.assertEqual(queries[0], queries[1])
+
+    def test_sync_post_comments_reconciles(self):
+        """Проверяем, что команда исправляет разошедшиеся счётчики."""
+        Comment.objects.bulk_create(
+            Comment(post=self.post, author=self.user, text=f'Текст {i}')
+            for i in range(3)
+        )
+        call_command('sync_post_comments', chunk_size=1, stdout=StringIO())
+        self.post.refresh_from_db()
+        self.assertEqual(self.post.comments_count, 3)
+        self.assertIsNotNone(self.post.last_comment_at)
@@ -1,8 +1,12 @@
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.paginator import Paginator
+from django.template.loader import render_to_string
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
 from posts.models import Group, Post
+from posts.paginator import CursorPaginator, encode_cursor, page_window
 from yatube.settings import NUMBER_OF_POSTS
 
 User = get_user_model()
@@ -43,3 +47,146 @@ class PaginatorViewsTest(TestCase):
             response = self.authorized_client.get(reverse_name)
             with self.subTest(reverse_name=reverse_name):
                 self.assertEqual(len(response.context['page_obj']), amount)
+
+
+@override_settings(CURSOR_PAGINATED_FEEDS=('index', 'group'))
+class CursorPaginatorViewsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.group = Group.objects.create(
+            title='Текстовая группа',
+            description='Тестовое описание',
+            slug='test-slug'
+        )
+        Post.objects.bulk_create(
+            Post(
+                author=cls.user,
+                text=f'Текст поста {i}',
+                group=cls.group,
+            ) for i in range(POSTS_AMOUNT * 2)
+        )
+
+    def setUp(self):
+        self.client = Client()
+        cache.clear()
+
+    def walk(self, url):
+        """Проходит ленту по курсорам ?after= до конца."""
+        seen = []
+        response = self.client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            seen.extend(post.pk for post in page_obj)
+            if not page_obj.has_next():
+                return seen, page_obj
+            response = self.client.get(
+                url, {'after': page_obj.next_cursor}
+            )
+
+    def test_cursor_pages_cover_feed_in_order(self):
+        """Проверяем, что курсорные страницы выдают все посты ровно один
+        раз и в порядке (-pub_date, -id)."""
+        expected = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)
+        )
+        for url in (
+            reverse('posts:index'),
+            reverse('posts:group', kwargs={'slug': self.group.slug}),
+        ):
+            with self.subTest(url=url):
+                seen, _ = self.walk(url)
+                self.assertEqual(seen, expected)
+
+    def test_before_cursor_returns_previous_page(self):
+        """Проверяем, что ?before= возвращает предыдущую страницу."""
+        url = reverse('posts:index')
+        first = self.client.get(url).context['page_obj']
+        second = self.client.get(
+            url, {'after': first.next_cursor}
+        ).context['page_obj']
+        back = self.client.get(
+            url, {'before': second.previous_cursor}
+        ).context['page_obj']
+        self.assertEqual(list(back), list(first))
+        self.assertFalse(back.has_previous())
+
+    def test_after_and_before_with_same_token_are_cached_apart(self):
+        """Проверяем, что ?after= и ?before= с одним токеном не делят
+        закешированный фрагмент ленты."""
+        url = reverse('posts:group', kwargs={'slug': self.group.slug})
+        first = self.client.get(url).context['page_obj']
+        token = self.client.get(
+            url, {'after': first.next_cursor}
+        ).context['page_obj'].next_cursor
+        self.client.get(url, {'after': token})
+        response = self.client.get(url, {'before': token})
+        for post in response.context['page_obj']:
+            with self.subTest(post=post.pk):
+                self.assertContains(
+                    response,
+                    'href="{}"'.format(reverse(
+                        'posts:post_detail', kwargs={'post_id': post.pk}
+                    )),
+                )
+
+    def test_cursor_page_skips_count_query(self):
+        """Проверяем, что страница строится одним запросом без COUNT."""
+        posts = Post.objects.all()
+        page_obj = CursorPaginator(posts, NUMBER_OF_POSTS).get_page()
+        with self.assertNumQueries(1) as queries:
+            deep = CursorPaginator(posts, NUMBER_OF_POSTS).get_page(
+                after=page_obj.next_cursor
+            )
+            list(deep)
+        self.assertNotIn('COUNT', queries.captured_queries[0]['sql'])
+        self.assertEqual(len(deep), NUMBER_OF_POSTS)
+
+    def test_broken_cursor_falls_back_to_first_page(self):
+        """Проверяем, что испорченный токен отдаёт первую страницу."""
+        response = self.client.get(reverse('posts:index'), {'after': '%%%'})
+        self.assertEqual(response.status_code, 200)
+        self.assertIsNone(response.context['page_obj'].cursor)
+
+    def test_cursor_with_wrong_value_types_falls_back(self):
+        """Проверяем, что токен с числами, null, списками или огромным id
+        вместо ключа отдаёт первую страницу, а не 500."""
+        for values in ([5, 1], [[1], 1], [None, 1], [True, 1],
+                       ['2020-01-01T00:00:00+00:00', 2 ** 70]):
+            with self.subTest(values=values):
+                response = self.client.get(
+                    reverse('posts:index'), {'after': encode_cursor(values)}
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertIsNone(response.context['page_obj'].cursor)
+
+
+class PageNavigationTest(TestCase):
+    def test_page_window(self):
+        """Проверяем окно номеров: края, окрестность текущей и пропуски."""
+        cases = {
+            (1, 5): [1, 2, 3, 4, 5],
+            (1, 100): [1, 2, 3, None, 100],
+            (50, 100): [1, None, 48, 49, 50, 51, 52, None, 100],
+            (100, 100): [1, None, 98, 99, 100],
+            (5, 10): [1, 2, 3, 4, 5, 6, 7, None, 10],
+        }
+        for (number, num_pages), expected in cases.items():
+            with self.subTest(number=number, num_pages=num_pages):
+                self.assertEqual(
+                    list(page_window(number, num_pages)), expected
+                )
+
+    def test_navigation_size_does_not_grow_with_pages(self):
+        """Проверяем, что число ссылок в навигации не зависит от числа
+        страниц в ленте."""
+        sizes = []
+        for num_pages in (100, 10000, 1000000):
+            page_obj = Paginator(range(num_pages), 1).page(num_pages // 2)
+            html = render_to_string(
+                'posts/includes/paginator.html', {'page_obj': page_obj}
+            )
+            sizes.append(html.count('<li'))
+        self.assertEqual(len(set(sizes)), 1)
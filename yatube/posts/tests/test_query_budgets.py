@@ -0,0 +1,162 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.test import Client, TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+
+from core.querybudget import (QueryBudgetExceeded,
+                              assert_independent_of_size, check_budget,
+                              normalize, query_budget)
+from posts import urls as posts_urls
+from posts.models import Comment, Follow, Group, Post
+from users import urls as users_urls
+
+User = get_user_model()
+
+# Сколько запросов разрешено каждому адресу. Запрос выполняет автор
+# поста и профиля, подписанный на остальных авторов; кеш перед каждым
+# запросом очищается. Число не должно зависеть от объёма данных.
+BUDGETS = {
+    'posts:index': 5,
+    'posts:group': 6,
+    'posts:profile': 8,
+    'posts:profile_export': 3,
+    'posts:post_edit': 5,
+    'posts:post_detail': 6,
+    'posts:post_create': 3,
+    'posts:search': 4,
+    'posts:add_comment': 3,
+    'posts:post_comments': 2,
+    'posts:follow_index': 5,
+    'posts:profile_follow': 3,
+    'posts:profile_unfollow': 4,
+    'users:signup': 2,
+    'users:logout': 4,
+    'users:login': 2,
+    'users:password_change': 2,
+    'users:password_change_done': 2,
+    'users:password_reset_form': 2,
+    'users:password_reset_done': 2,
+    'users:password_reset_confirm': 3,
+    'users:password_reset_complete': 2,
+}
+SIZES = (1, 100)
+
+
+def url_names():
+    for module in (posts_urls, users_urls):
+        for pattern in module.urlpatterns:
+            if isinstance(pattern, URLPattern):
+                yield f'{module.app_name}:{pattern.name}', pattern
+
+
+class QueryBudgetTest(TestCase):
+    def build(self, size):
+        """Автор с size постами и подписками на size авторов, у каждого по
+        посту, и size комментариев разных людей к посту автора."""
+        author = User.objects.create_user(username=f'author{size}')
+        group = Group.objects.create(
+            title='Группа', slug=f'group{size}', description='Описание'
+        )
+        others = [
+            User.objects.create(username=f'other{size}_{i}')
+            for i in range(size)
+        ]
+        posts = [
+            Post.objects.create(author=author, text=f'Пост {i}', group=group)
+            for i in range(size)
+        ]
+        for other in others:
+            Post.objects.create(author=other, text='Чужой пост', group=group)
+            Follow.objects.create(user=author, author=other)
+            Comment.objects.create(
+                post=posts[0], author=other, text='Комментарий'
+            )
+        return author, {
+            'post_id': posts[0].pk,
+            'username': author.username,
+            'slug': group.slug,
+            'uidb64': 'MQ',
+            'token': 'set-password',
+        }
+
+    def capture(self, size):
+        """{имя адреса: запросы} для данных объёма size; изменения,
+        сделанные запросами, откатываются."""
+        runs = {}
+        with transaction.atomic():
+            author, params = self.build(size)
+            for name, pattern in url_names():
+                url = reverse(name, kwargs={
+                    key: params[key] for key in pattern.pattern.converters
+                })
+                if name == 'posts:search':
+                    url += '?q=Пост'
+                client = Client()
+                client.force_login(author)
+                cache.clear()
+                with transaction.atomic():
+                    with CaptureQueriesContext(connection) as queries:
+                        client.get(url)
+                    transaction.set_rollback(True)
+                runs[name] = queries.captured_queries
+            transaction.set_rollback(True)
+        return runs
+
+    def test_every_url_has_budget(self):
+        """Проверяем, что у каждого адреса есть бюджет запросов."""
+        names = {name for name, _ in url_names()}
+        self.assertEqual(names, set(BUDGETS))
+
+    def test_urls_stay_within_budget_at_any_size(self):
+        """Проверяем бюджет и независимость числа запросов от объёма
+        данных для каждого адреса."""
+        runs = {size: self.capture(size) for size in SIZES}
+        for name, budget in BUDGETS.items():
+            with self.subTest(name=name):
+                for size in SIZES:
+                    check_budget(
+                        runs[size][name], budget, f'{name} ({size})'
+                    )
+                assert_independent_of_size(
+                    name, {size: runs[size][name] for size in SIZES}
+                )
+
+
+class QueryBudgetHarnessTest(TestCase):
+    def test_normalize_merges_parameters(self):
+        """Проверяем, что запросы с разными значениями совпадают после
+        нормализации."""
+        self.assertEqual(
+            normalize('SELECT * FROM "t" WHERE "t"."id" IN (1, 2, 3)'),
+            normalize('SELECT * FROM "t"  WHERE "t"."id" IN (7)'),
+        )
+        self.assertEqual(
+            normalize('SELECT 1 FROM "t" WHERE "name" = \'x\' LIMIT 21'),
+            'SELECT ? FROM "t" WHERE "name" = ? LIMIT ?',
+        )
+
+    def test_failure_groups_repeated_queries(self):
+        """Проверяем, что сообщение группирует повторы одного запроса."""
+        user = User.objects.create_user(username='user')
+        posts = [
+            Post.objects.create(author=user, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        with self.assertRaises(QueryBudgetExceeded) as error:
+            with query_budget(1, label='N+1'):
+                for post in Post.objects.filter(pk__in=[p.pk for p in posts]):
+                    post.author.username
+        message = str(error.exception)
+        self.assertIn('N+1: 4 запросов при бюджете 1', message)
+        self.assertIn('3 × SELECT', message)
+
+    def test_decorator(self):
+        """Проверяем query_budget в роли декоратора."""
+        @query_budget(0)
+        def read():
+            return User.objects.count()
+
+        with self.assertRaises(QueryBudgetExceeded):
+            read()
@@ -1,13 +1,46 @@
+import glob
+import gzip
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.admin.widgets import AutocompleteSelect
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
-from django.test import Client, TestCase
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
+from PIL import Image
 
-from posts.models import Comment, Follow, Group, Post
+from posts import export, images, thumbnails, timeline
+from posts.cache import ALL_POSTS, get_versions
+from posts.kvstore import KVStore
+from posts.models import Comment, Follow, Group, Post, TimelineEntry
 from posts.forms import CommentForm, PostForm
+from posts.timeline import FollowFeed
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostPagesTests(TestCase):
     @classmethod
@@ -209,3 +242,904 @@ class PostPagesTests(TestCase):
         self.assertEqual(response.context.get('post'), self.post)
         response = self.authorized_another.get(reverse('posts:follow_index'))
         self.assertNotEqual(response.context.get('post'), self.post)
+
+
+class FollowTimelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.old_post = Post.objects.create(author=cls.author, text='Старый')
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+        cache.clear()
+
+    def feed(self):
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'])
+
+    def test_follow_backfills_and_new_posts_fan_out(self):
+        """Проверяем, что подписка заполняет ленту старыми постами,
+        а новые посты попадают в неё при публикации."""
+        self.reader_client.get(
+            reverse('posts:profile_follow', args=[self.author.username])
+        )
+        self.assertEqual(self.feed(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertTrue(
+            TimelineEntry.objects.filter(
+                user=self.reader, post=new_post
+            ).exists()
+        )
+        self.assertEqual(self.feed(), [new_post, self.old_post])
+
+    def test_unfollow_prunes_timeline(self):
+        """Проверяем, что отписка убирает посты автора из ленты."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.reader_client.get(
+            reverse('posts:profile_unfollow', args=[self.author.username])
+        )
+        self.assertFalse(TimelineEntry.objects.filter(user=self.reader))
+        self.assertEqual(self.feed(), [])
+
+    @override_settings(TIMELINE_MAX_LENGTH=2)
+    def test_timeline_is_trimmed_to_cap(self):
+        """Проверяем, что в ленте остаются только последние посты."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {i}') for i in range(3)
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        kept = list(
+            Post.objects.order_by('-pub_date', '-id')
+            .values_list('pk', flat=True)[:2]
+        )
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)
+            ),
+            kept,
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=2, TIMELINE_TRIM_EVERY=1)
+    def test_fan_out_trims_timeline(self):
+        """Проверяем, что раскладка новых постов срезает ленту."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        posts = [
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        self.assertEqual(
+            list(
+                TimelineEntry.objects.filter(user=self.reader)
+                .values_list('post_id', flat=True)
+            ),
+            [post.pk for post in posts[:0:-1]],
+        )
+
+    @override_settings(TIMELINE_MAX_LENGTH=2, TIMELINE_TRIM_EVERY=2)
+    def test_fan_out_trims_regardless_of_ids(self):
+        """Проверяем, что ленту срезают и тогда, когда id постов автора
+        идут через один, как при поочерёдных публикациях двух авторов."""
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        for i in range(40):
+            Post.objects.create(author=self.author, text=f'Пост {i}')
+            Post.objects.create(author=other, text=f'Чужой {i}')
+        self.assertLess(
+            TimelineEntry.objects.filter(user=self.reader).count(), 40
+        )
+
+
+@override_settings(
+    TIMELINE_FANOUT_MAX_FOLLOWERS=1,
+    CURSOR_PAGINATED_FEEDS=('follow',),
+    NUMBER_OF_POSTS=3,
+)
+class HybridFollowFeedTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.star = User.objects.create_user(username='star')
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.fan = User.objects.create_user(username='fan')
+        for user in (cls.reader, cls.fan):
+            Follow.objects.create(user=user, author=cls.star)
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_popular_author_is_not_fanned_out(self):
+        """Проверяем, что посты автора с большим числом подписчиков не
+        раскладываются по лентам."""
+        post = Post.objects.create(author=self.star, text='Звезда')
+        self.assertFalse(TimelineEntry.objects.filter(post=post).exists())
+
+    def test_feed_merges_pushed_and_pulled_posts(self):
+        """Проверяем, что лента сливает оба источника по дате."""
+        posts = [
+            Post.objects.create(
+                author=self.star if i % 2 else self.author,
+                text=f'Пост {i}',
+            ) for i in range(7)
+        ]
+        url = reverse('posts:follow_index')
+        seen = []
+        response = self.reader_client.get(url)
+        while True:
+            page_obj = response.context['page_obj']
+            seen.extend(page_obj)
+            if not page_obj.has_next():
+                break
+            response = self.reader_client.get(
+                url, {'after': page_obj.next_cursor}
+            )
+        self.assertEqual(seen, posts[::-1])
+
+    @override_settings(CURSOR_PAGINATED_FEEDS=())
+    def test_feed_merges_sources_with_page_numbers(self):
+        """Проверяем слияние источников при постраничной навигации."""
+        posts = [
+            Post.objects.create(
+                author=self.star if i % 2 else self.author,
+                text=f'Пост {i}',
+            ) for i in range(5)
+        ]
+        url = reverse('posts:follow_index')
+        second = self.reader_client.get(url, {'page': 2})
+        page_obj = second.context['page_obj']
+        self.assertEqual(page_obj.paginator.count, 5)
+        self.assertEqual(list(page_obj), posts[1::-1])
+
+    @override_settings(
+        TIMELINE_FANOUT_MAX_FOLLOWERS=3,
+        TIMELINE_FANOUT_RESUME_FOLLOWERS=2,
+        TIMELINE_WORKERS=0,
+    )
+    def test_posts_survive_crossing_threshold_both_ways(self):
+        """Проверяем, что автор возвращается к раскладке только ниже
+        нижнего порога, а посты, опубликованные, пока он был крупным,
+        дозаполняются в ленты после коммита."""
+        extra = User.objects.create_user(username='extra')
+        late = User.objects.create_user(username='late')
+        old_post = Post.objects.create(author=self.author, text='Старый')
+        for user in (self.fan, extra, late):
+            Follow.objects.create(user=user, author=self.author)
+        self.assertTrue(timeline.is_pulled(self.author.pk))
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(TimelineEntry.objects.filter(post=new_post))
+        with mock.patch(
+            'posts.timeline.transaction.on_commit'
+        ) as on_commit:
+            Follow.objects.filter(user=self.fan, author=self.author).delete()
+            self.assertTrue(timeline.is_pulled(self.author.pk))
+            self.assertFalse(on_commit.called)
+            Follow.objects.filter(user=extra, author=self.author).delete()
+            self.assertFalse(timeline.is_pulled(self.author.pk))
+            self.assertFalse(TimelineEntry.objects.filter(post=new_post))
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        for user in (self.reader, late):
+            with self.subTest(user=user.username):
+                self.assertEqual(
+                    list(
+                        TimelineEntry.objects.filter(
+                            user=user, author=self.author
+                        ).values_list('post_id', flat=True)
+                    ),
+                    [new_post.pk, old_post.pk],
+                )
+                feed = [
+                    post for post in FollowFeed(user)[:10]
+                    if post.author == self.author
+                ]
+                self.assertEqual(feed, [new_post, old_post])
+
+
+class FeedCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.other_group = Group.objects.create(
+            title='Другая', slug='other', description='Описание'
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.reader_client = Client()
+        self.reader_client.force_login(self.reader)
+
+    def test_new_post_is_visible_in_warm_cache(self):
+        """Проверяем, что новый пост виден сразу, несмотря на кеш ленты."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(self.client.get(url), 'Свежий пост')
+
+    def test_feeds_do_not_share_cached_fragments(self):
+        """Проверяем, что лента подписок не отдаёт фрагмент главной."""
+        Post.objects.create(author=self.author, text='Чужой пост')
+        self.reader_client.get(reverse('posts:index'))
+        response = self.reader_client.get(reverse('posts:follow_index'))
+        self.assertNotContains(response, 'Чужой пост')
+
+    def test_edit_link_is_not_shared_between_viewers(self):
+        """Проверяем, что фрагмент автора не отдаётся другому читателю."""
+        post = Post.objects.create(author=self.author, text='Пост')
+        author_client = Client()
+        author_client.force_login(self.author)
+        edit_url = reverse('posts:post_edit', args=[post.pk])
+        self.assertContains(
+            author_client.get(reverse('posts:index')), edit_url
+        )
+        self.assertNotContains(
+            self.reader_client.get(reverse('posts:index')), edit_url
+        )
+
+    def test_comment_refreshes_only_pages_with_its_post(self):
+        """Проверяем, что комментарий обновляет счётчик на главной, но не
+        сбрасывает ленты, где его поста нет."""
+        post = Post.objects.create(
+            author=self.author, text='Пост', group=self.group
+        )
+        Post.objects.create(
+            author=self.author, text='Пост', group=self.other_group
+        )
+        other_url = reverse('posts:group', args=[self.other_group.slug])
+        self.client.get(reverse('posts:index'))
+        self.client.get(other_url)
+        all_posts = get_versions(ALL_POSTS)
+        Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий'
+        )
+        self.assertEqual(get_versions(ALL_POSTS), all_posts)
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Комментариев: 1'
+        )
+        with self.assertNumQueries(0):
+            self.client.get(other_url)
+
+    def test_moving_post_invalidates_old_group(self):
+        """Проверяем, что перенос поста обновляет страницу старой группы."""
+        post = Post.objects.create(
+            author=self.author, text='Переезжающий пост', group=self.group
+        )
+        url = reverse('posts:group', args=[self.group.slug])
+        self.assertContains(self.client.get(url), 'Переезжающий пост')
+        post.group = self.other_group
+        post.save()
+        self.assertNotContains(self.client.get(url), 'Переезжающий пост')
+
+
+class AnonymousPageCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.commenter = User.objects.create_user(username='commenter')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_repeated_anonymous_request_skips_view(self):
+        """Проверяем, что повторный анонимный запрос не ходит в базу."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(second.content, first.content)
+
+    def test_comment_invalidates_post_page(self):
+        """Проверяем, что новый комментарий сбрасывает страницу поста."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        Comment.objects.create(
+            post=self.post, author=self.commenter, text='Свежий комментарий'
+        )
+        self.assertContains(self.client.get(url), 'Свежий комментарий')
+
+    def test_requests_with_session_bypass_cache(self):
+        """Проверяем, что запросы с cookie сессии не кешируются."""
+        url = reverse('posts:index')
+        self.client.get(url)
+        self.client.force_login(self.commenter)
+        response = self.client.get(url)
+        self.assertTemplateUsed(response, 'posts/index.html')
+
+
+class ConditionalGetTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(
+            title='Группа', slug='group', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, text='Пост', group=cls.group
+        )
+        cls.urls = (
+            reverse('posts:index'),
+            reverse('posts:group', args=[cls.group.slug]),
+            reverse('posts:profile', args=[cls.author.username]),
+            reverse('posts:post_detail', args=[cls.post.pk]),
+        )
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def assertNotModified(self, url, etag):
+        with self.assertNumQueries(3):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.templates, [])
+        self.assertEqual(response['ETag'], etag)
+
+    def test_unchanged_pages_are_not_rendered(self):
+        """Проверяем, что на неизменную страницу отвечаем 304 без
+        отрисовки шаблона."""
+        for url in self.urls:
+            with self.subTest(url=url):
+                etag = self.client.get(url)['ETag']
+                self.assertNotModified(url, etag)
+
+    def test_anonymous_cached_page_answers_304(self):
+        """Проверяем, что закешированная анонимная страница тоже даёт
+        304."""
+        client = Client()
+        url = reverse('posts:index')
+        etag = client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+    def test_changes_and_other_viewer_get_fresh_page(self):
+        """Проверяем, что правка, комментарий и другой читатель получают
+        страницу заново."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        changes = (
+            self.edit_post,
+            lambda: Comment.objects.create(
+                post=self.post, author=self.reader, text='Комментарий'
+            ),
+            lambda: self.client.force_login(self.author),
+        )
+        for change in changes:
+            with self.subTest(change=change):
+                change()
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+                self.assertTemplateUsed(response, 'posts/post_detail.html')
+                self.assertNotEqual(response['ETag'], etag)
+                etag = response['ETag']
+
+    def test_comment_changes_feed_etags(self):
+        """Проверяем, что комментарий меняет ETag главной, группы и
+        профиля."""
+        etags = {url: self.client.get(url)['ETag'] for url in self.urls}
+        Comment.objects.create(
+            post=self.post, author=self.reader, text='Комментарий'
+        )
+        for url, etag in etags.items():
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 200)
+
+    def test_deleting_older_comment_changes_index_etag(self):
+        """Проверяем, что удаление не самого свежего комментария меняет
+        ETag главной: даты при этом не меняются."""
+        other = Post.objects.create(author=self.author, text='Другой')
+        older = Comment.objects.create(
+            post=self.post, author=self.reader, text='Старый'
+        )
+        Comment.objects.create(post=other, author=self.reader, text='Новый')
+        url = reverse('posts:index')
+        etag = self.client.get(url)['ETag']
+        older.delete()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def edit_post(self):
+        post = Post.objects.get(pk=self.post.pk)
+        post.text = 'Правка'
+        post.save()
+
+    def test_missing_objects_still_404(self):
+        """Проверяем, что для несуществующих объектов остаётся 404."""
+        response = self.client.get(
+            reverse('posts:profile', args=['nobody']), HTTP_IF_NONE_MATCH='*'
+        )
+        self.assertEqual(response.status_code, 404)
+
+
+class ProfileExportTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.posts = [
+            Post.objects.create(author=cls.author, text=f'Пост {i}')
+            for i in range(3)
+        ]
+        Post.objects.create(author=cls.other, text='Чужой')
+        cls.url = reverse('posts:profile_export', args=['author'])
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def test_export_streams_only_author_posts(self):
+        """Проверяем, что выгрузка потоковая и содержит только посты
+        автора."""
+        response = self.client.get(self.url)
+        self.assertTrue(response.streaming)
+        self.assertIn('author-posts.jsonl', response['Content-Disposition'])
+        rows = [
+            json.loads(line) for line in
+            b''.join(response.streaming_content).decode().splitlines()
+        ]
+        self.assertEqual(
+            [row['text'] for row in rows], [post.text for post in self.posts]
+        )
+
+    def test_csv_gzip_export(self):
+        """Проверяем выгрузку CSV со сжатием на лету."""
+        response = self.client.get(self.url, {'format': 'csv', 'gzip': 1})
+        self.assertEqual(response['Content-Type'], 'application/gzip')
+        lines = gzip.decompress(
+            b''.join(response.streaming_content)
+        ).decode().splitlines()
+        self.assertEqual(
+            lines[0], 'id,author,group,text,pub_date,image'
+        )
+        self.assertEqual(len(lines), 4)
+
+    def test_records_are_fetched_in_keyset_batches(self):
+        """Проверяем, что выгрузка идёт пачками по ключу."""
+        with CaptureQueriesContext(connection) as queries:
+            rows = list(export.records('posts', chunk_size=2))
+        self.assertEqual(len(rows), 4)
+        # Две полные пачки и пустая, по которой видно конец таблицы.
+        self.assertEqual(len(queries), 3)
+        self.assertIn('"posts_post"."id" >', queries[1]['sql'])
+
+    def test_only_author_can_export(self):
+        """Проверяем, что чужие посты выгрузить нельзя."""
+        self.client.force_login(self.other)
+        self.assertEqual(self.client.get(self.url).status_code, 403)
+        self.client.logout()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class PostCardCacheTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Карточка')
+
+    def setUp(self):
+        cache.clear()
+        self.author_client = Client()
+        self.author_client.force_login(self.author)
+
+    def test_card_is_shared_between_feeds(self):
+        """Проверяем, что карточка, отрисованная на главной, берётся из кеша
+        на странице автора."""
+        self.author_client.get(reverse('posts:index'))
+        response = self.author_client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertTemplateNotUsed(response, 'includes/pub_card_body.html')
+        self.assertContains(
+            response, reverse('posts:post_edit', args=[self.post.pk])
+        )
+
+    def test_edit_invalidates_card(self):
+        """Проверяем, что изменение поста обновляет карточку."""
+        self.author_client.get(reverse('posts:index'))
+        self.post.text = 'Исправленная карточка'
+        self.post.save()
+        response = self.author_client.get(
+            reverse('posts:profile', args=[self.author.username])
+        )
+        self.assertContains(response, 'Исправленная карточка')
+
+
+@override_settings(COMMENTS_PER_PAGE=5)
+class PostCommentsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+        commenters = [
+            User.objects.create_user(username=f'commenter{i}')
+            for i in range(12)
+        ]
+        cls.comments = [
+            Comment.objects.create(
+                post=cls.post, author=commenter, text=f'Комментарий {i}'
+            ) for i, commenter in enumerate(commenters)
+        ]
+
+    def setUp(self):
+        cache.clear()
+
+    def test_comment_authors_are_joined(self):
+        """Проверяем, что число запросов не растёт с числом комментариев."""
+        url = reverse('posts:post_detail', args=[self.post.pk])
+        self.client.get(url)
+        cache.clear()
+        # Первый запрос — валидатор ETag.
+        with self.assertNumQueries(4):
+            response = self.client.get(url)
+        self.assertEqual(
+            list(response.context['comments']), self.comments[:5]
+        )
+
+    def test_load_more_returns_next_batch(self):
+        """Проверяем, что фрагмент отдаёт следующую пачку комментариев."""
+        response = self.client.get(
+            reverse('posts:post_detail', args=[self.post.pk])
+        )
+        next_cursor = response.context['comments'].next_cursor
+        fragment = self.client.get(
+            reverse('posts:post_comments', args=[self.post.pk]),
+            {'after': next_cursor},
+        )
+        self.assertTemplateUsed(fragment, 'posts/includes/comments.html')
+        self.assertEqual(
+            list(fragment.context['comments']), self.comments[5:10]
+        )
+        self.assertContains(fragment, 'Показать ещё комментарии')
+
+
+@override_settings(NUMBER_OF_POSTS=2)
+class SearchTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+        cls.post = Post.objects.create(
+            author=cls.user, text='Кот <b>сидит</b> на окне'
+        )
+        Post.objects.bulk_create(
+            Post(author=cls.user, text=f'Кот номер {i}') for i in range(3)
+        )
+        Post.objects.create(author=cls.user, text='Собака')
+
+    def search(self, query, **params):
+        return self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+
+    def test_search_finds_posts_by_words(self):
+        """Проверяем, что поиск находит посты, включая добавленные через
+        bulk_create, и листается курсором с сохранением запроса."""
+        response = self.search('кот')
+        page_obj = response.context['page_obj']
+        found = list(page_obj)
+        self.assertEqual(len(found), 2)
+        self.assertContains(response, 'q=%D0%BA%D0%BE%D1%82')
+        while page_obj.has_next():
+            page_obj = self.search(
+                'кот', after=page_obj.next_cursor
+            ).context['page_obj']
+            found.extend(page_obj)
+        self.assertEqual(len(found), 4)
+        self.assertEqual(len(set(found)), 4)
+
+    def test_snippet_is_highlighted_and_escaped(self):
+        """Проверяем, что совпадение подсвечено, а HTML поста экранирован."""
+        response = self.search('окне')
+        self.assertContains(response, '<mark>окне</mark>')
+        self.assertContains(response, '&lt;b&gt;')
+
+    def test_index_follows_edits_and_deletes(self):
+        """Проверяем, что индекс обновляется при правке и удалении."""
+        self.post.text = 'Попугай'
+        self.post.save()
+        self.assertEqual(list(self.search('попугай').context['page_obj']),
+                         [self.post])
+        self.post.delete()
+        self.assertEqual(list(self.search('попугай').context['page_obj']),
+                         [])
+
+    def test_admin_search_uses_index(self):
+        """Проверяем, что поиск в админке идёт через FTS-индекс."""
+        admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
+
+
+class PostAdminTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.admin = User.objects.create_superuser(
+            username='admin', email='admin@example.com', password='pass'
+        )
+        cls.group = Group.objects.create(
+            title='Тестовая группа', slug='test-slug', description='Описание'
+        )
+
+    def setUp(self):
+        self.client.force_login(self.admin)
+
+    def changelist_queries(self, posts_count):
+        Post.objects.bulk_create(
+            Post(author=self.admin, text=f'Пост {i}', group=self.group)
+            for i in range(posts_count)
+        )
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:posts_post_changelist'))
+        self.assertEqual(response.context['cl'].result_count,
+                         Post.objects.count())
+        return len(queries)
+
+    def test_changelist_queries_do_not_grow_with_rows(self):
+        """Проверяем, что авторы, группы и варианты выбора группы
+        читаются одинаковым числом запросов при любом числе строк."""
+        few = self.changelist_queries(2)
+        self.assertEqual(self.changelist_queries(20), few)
+
+    @override_settings(ADMIN_ESTIMATED_COUNT_MIN=3)
+    def test_unfiltered_count_comes_from_statistics(self):
+        """Проверяем, что без фильтров размер таблицы берётся из
+        статистики базы, а с фильтром считается точно."""
+        Post.objects.bulk_create(
+            Post(author=self.admin, text=f'Пост {i}') for i in range(5)
+        )
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+        Post.objects.filter(pk__in=Post.objects.values('pk')[:2]).delete()
+        url = reverse('admin:posts_post_changelist')
+        self.assertEqual(self.client.get(url).context['cl'].result_count, 5)
+        response = self.client.get(url, {'author__id__exact': self.admin.pk})
+        self.assertEqual(response.context['cl'].result_count, 3)
+
+    def test_change_form_uses_autocomplete(self):
+        """Проверяем, что автор и группа выбираются автодополнением."""
+        post = Post.objects.create(author=self.admin, text='Пост')
+        response = self.client.get(
+            reverse('admin:posts_post_change', args=(post.pk,))
+        )
+        form = response.context['adminform'].form
+        for name in ('author', 'group'):
+            with self.subTest(field=name):
+                self.assertIsInstance(
+                    form.fields[name].widget.widget, AutocompleteSelect
+                )
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ThumbnailPipelineTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        KVStore.local.clear()
+
+    def create_post(self, content=SMALL_GIF, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    @staticmethod
+    def large_image():
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500), 'red').save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def test_variants_are_stored_next_to_original(self):
+        """Проверяем, что варианты нарезаны по ширинам не больше
+        оригинала, лежат рядом с ним и попадают в srcset."""
+        post = self.create_post(self.large_image(), 'large.png')
+        call_command('backfill_image_variants', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        extensions = images.available_extensions()
+        self.assertEqual(
+            post.image_variants.split(),
+            [f'{w}.{e}' for w in (320, 640, 960) for e in extensions],
+        )
+        root = os.path.splitext(post.image.path)[0]
+        with Image.open(f'{root}_w640.jpg') as variant:
+            self.assertEqual(variant.size, (640, 226))
+        response = self.client.get(
+            reverse('posts:post_detail', args=(post.pk,))
+        )
+        self.assertContains(response, f'{post.image.url[:-4]}_w960.jpg 960w')
+        self.assertNotContains(response, '_w1920')
+        self.assertEqual(
+            'image/webp' in response.content.decode(),
+            'webp' in extensions,
+        )
+
+    def test_backfill_limited_to_given_images(self):
+        """Проверяем, что с --images нарезаются только указанные
+        картинки."""
+        chosen = self.create_post(self.large_image(), 'chosen.png')
+        buffer = BytesIO()
+        Image.new('RGB', (1000, 500), 'blue').save(buffer, 'PNG')
+        other = self.create_post(buffer.getvalue(), 'other.png')
+        call_command(
+            'backfill_image_variants', workers=0, images=[chosen.image.name],
+            stdout=StringIO(),
+        )
+        chosen.refresh_from_db()
+        other.refresh_from_db()
+        self.assertNotEqual(chosen.image_variants, '')
+        self.assertEqual(other.image_variants, '')
+
+    def test_new_image_drops_old_variants(self):
+        """Проверяем, что при замене картинки старые варианты забываются."""
+        post = self.create_post(self.large_image(), 'large.png')
+        call_command('backfill_image_variants', workers=0, stdout=StringIO())
+        post.refresh_from_db()
+        post.image = SimpleUploadedFile('new.gif', SMALL_GIF, 'image/gif')
+        post.save()
+        post.refresh_from_db()
+        self.assertEqual(post.image_variants, '')
+
+    def test_upload_queues_thumbnails_after_commit(self):
+        """Проверяем, что до нарезки показывается заглушка, а после
+        коммита миниатюры готовы и страница поста обновляется."""
+        with mock.patch(
+            'posts.thumbnails.transaction.on_commit'
+        ) as on_commit:
+            post = self.create_post()
+            url = reverse('posts:post_detail', args=(post.pk,))
+            self.assertContains(self.client.get(url), 'thumbnail-placeholder')
+        self.assertTrue(on_commit.called)
+        for call in on_commit.call_args_list:
+            call[0][0]()
+        self.assertIsNotNone(thumbnails.ready_thumbnail(post.image, 'card'))
+        response = self.client.get(url)
+        self.assertNotContains(response, 'thumbnail-placeholder')
+        self.assertContains(response, 'srcset=')
+        self.assertContains(response, 'loading="lazy"')
+
+    def test_command_pregenerates_existing_images(self):
+        """Проверяем, что команда нарезает миниатюры старых постов."""
+        posts = [self.create_post() for _ in range(3)]
+        call_command('pregenerate_thumbnails', workers=0, stdout=StringIO())
+        for post in posts:
+            with self.subTest(post=post.pk):
+                self.assertIsNotNone(
+                    thumbnails.ready_thumbnail(post.image, 'card')
+                )
+
+    def test_feed_reads_thumbnail_records_in_one_batch(self):
+        """Проверяем, что записи о миниатюрах ленты читаются из базы одним
+        запросом, а повторно — из памяти процесса."""
+        for _ in range(3):
+            thumbnails.generate(self.create_post().image)
+        cache.clear()
+        KVStore.local.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'thumbnail-placeholder')
+        kvstore_queries = [
+            query for query in queries.captured_queries
+            if 'thumbnail_kvstore' in query['sql']
+        ]
+        self.assertEqual(len(kvstore_queries), 1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse('posts:index'))
+        self.assertFalse(any(
+            'thumbnail_kvstore' in query['sql']
+            for query in queries.captured_queries
+        ))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT, THUMBNAIL_WORKERS=0)
+class ContentAddressedStorageTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='auth')
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        # В TestCase транзакция не коммитится, поэтому нарезка миниатюр
+        # после коммита выполняется сразу.
+        patcher = mock.patch(
+            'django.db.transaction.on_commit', lambda func: func()
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_post(self, content=SMALL_GIF, name='small.gif'):
+        return Post.objects.create(
+            author=self.user,
+            text='Пост с картинкой',
+            image=SimpleUploadedFile(name, content, 'image/gif'),
+        )
+
+    def test_identical_uploads_share_one_file(self):
+        """Проверяем, что одинаковые картинки хранятся одним файлом,
+        названным по хешу содержимого."""
+        first = self.create_post(name='first.gif')
+        second = self.create_post(name='second.GIF')
+        digest = hashlib.sha256(SMALL_GIF).hexdigest()
+        self.assertEqual(first.image.name, f'posts/{digest[:2]}/{digest}.gif')
+        self.assertEqual(second.image.name, first.image.name)
+        directory = os.path.dirname(first.image.path)
+        self.assertEqual(
+            glob.glob(os.path.join(directory, '*.gif')),
+            [first.image.path],
+        )
+
+    def test_file_is_collected_after_last_reference(self):
+        """Проверяем, что файл без постов удаляет gc_media, а не удаление
+        поста: ссылку на него может держать незакоммиченная загрузка."""
+        first = self.create_post()
+        second = self.create_post()
+        path = first.image.path
+        first.delete()
+        second.delete()
+        self.assertTrue(os.path.exists(path))
+        call_command('gc_media', min_age=-60, stdout=StringIO())
+        self.assertFalse(os.path.exists(path))
+
+    def test_reupload_renews_gc_grace_period(self):
+        """Проверяем, что повторная загрузка того же файла продлевает
+        ему отсрочку gc_media."""
+        post = self.create_post()
+        path = post.image.path
+        os.utime(path, (0, 0))
+        post.delete()
+        self.create_post().delete()
+        call_command('gc_media', min_age=60, stdout=StringIO())
+        self.assertTrue(os.path.exists(path))
+
+    def test_gc_removes_orphaned_files(self):
+        """Проверяем, что сборщик удаляет только файлы без постов."""
+        post = self.create_post()
+        storage = post.image.storage
+        orphan = storage.save('posts/orphan.gif', ContentFile(b'orphan'))
+        kept_variant = images.variant_name(post.image.name, 320, 'jpg')
+        storage.save_derived(kept_variant, ContentFile(b'variant'))
+        lost_variant = images.variant_name(orphan, 320, 'jpg')
+        storage.save_derived(lost_variant, ContentFile(b'variant'))
+        call_command('gc_media', min_age=-60, stdout=StringIO())
+        self.assertTrue(storage.exists(post.image.name))
+        self.assertTrue(storage.exists(kept_variant))
+        self.assertFalse(storage.exists(orphan))
+        self.assertFalse(storage.exists(lost_variant))
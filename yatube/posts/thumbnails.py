@@ -0,0 +1,168 @@
+"""Фоновая нарезка миниатюр и вариантов картинок постов.
+
+Шаблоны не вызывают sorl-thumbnail напрямую: {% post_image %} рисует
+варианты для srcset (posts.images), если они уже нарезаны, затем готовую
+миниатюру из key-value хранилища sorl, а иначе — заглушку, и ставит
+картинку в очередь. Очередь — пул потоков процесса; сохранение поста с
+картинкой ставит её туда после коммита транзакции. Когда всё нарезано,
+версии кеша поста и его лент поднимаются, и заглушка пропадает.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from sorl.thumbnail import default
+from sorl.thumbnail.base import ThumbnailBackend
+from sorl.thumbnail.conf import defaults as sorl_defaults
+from sorl.thumbnail.conf import settings as sorl_settings
+from sorl.thumbnail.images import ImageFile
+
+from . import cache, images
+from .models import Post
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_pending = set()
+_lock = threading.Lock()
+
+
+class LookupBackend(ThumbnailBackend):
+    """Находит миниатюру по тем же правилам, что и get_thumbnail, но не
+    создаёт её."""
+
+    def get_thumbnail_file(self, file_, geometry_string, **options):
+        """Файл миниатюры, который создал бы get_thumbnail."""
+        source = ImageFile(file_)
+        if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+            options.setdefault('format', self._get_format(source))
+        for key, value in self.default_options.items():
+            options.setdefault(key, value)
+        for key, attr in self.extra_options:
+            value = getattr(sorl_settings, attr)
+            if value != getattr(sorl_defaults, attr):
+                options.setdefault(key, value)
+        name = self._get_thumbnail_filename(source, geometry_string, options)
+        return ImageFile(name, default.storage)
+
+    def get_ready_thumbnail(self, file_, geometry_string, **options):
+        return default.kvstore.get(
+            self.get_thumbnail_file(file_, geometry_string, **options)
+        )
+
+
+backend = LookupBackend()
+
+
+def preset(name):
+    """Геометрия и опции sorl для размера name."""
+    geometry, options = settings.THUMBNAIL_PRESETS[name]
+    return geometry, dict(options)
+
+
+def ready_thumbnail(image, name):
+    """Готовая миниатюра картинки image размера name или None."""
+    if not image:
+        return None
+    geometry, options = preset(name)
+    return backend.get_ready_thumbnail(image, geometry, **options)
+
+
+def prefetch_thumbnails(posts, name):
+    """Загружает записи о миниатюрах картинок posts одной пачкой.
+
+    Работает, если key-value хранилище sorl умеет prefetch (см.
+    posts.kvstore); после этого ready_thumbnail не ходит в кеш.
+    """
+    prefetch = getattr(default.kvstore, 'prefetch', None)
+    if prefetch is None:
+        return
+    geometry, options = preset(name)
+    prefetch([
+        backend.get_thumbnail_file(post.image, geometry, **options)
+        for post in posts if post.image
+    ])
+
+
+def generate(image):
+    """Создаёт миниатюры всех размеров; возвращает их число."""
+    for geometry, options in settings.THUMBNAIL_PRESETS.values():
+        default.backend.get_thumbnail(image, geometry, **options)
+    return len(settings.THUMBNAIL_PRESETS)
+
+
+def post_scopes(post):
+    """Области кеша, где видна картинка поста."""
+    scopes = [
+        cache.ALL_POSTS,
+        cache.author_scope(post.author_id),
+        cache.post_scope(post.pk),
+    ]
+    if post.group_id:
+        scopes.append(cache.group_scope(post.group_id))
+    return scopes
+
+
+def run(image, scopes, post_id):
+    """Нарезает варианты и миниатюры картинки поста post_id и сбрасывает
+    кеш scopes; False при ошибке."""
+    try:
+        # Если картинку успели заменить, варианты старой не записываются.
+        Post.objects.filter(pk=post_id, image=image.name).update(
+            image_variants=images.generate_variants(image)
+        )
+        generate(image)
+        cache.bump(*scopes)
+        return True
+    except Exception:
+        logger.exception('Не удалось нарезать миниатюры %s', image.name)
+        return False
+    finally:
+        with _lock:
+            _pending.discard(image.name)
+
+
+def _work(image, scopes, post_id):
+    # Соединения с базой у потоков пула свои, Django их сам не закрывает.
+    try:
+        run(image, scopes, post_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails',
+            )
+        return _executor
+
+
+def _submit(image, scopes, post_id):
+    with _lock:
+        if image.name in _pending:
+            return
+        _pending.add(image.name)
+    if settings.THUMBNAIL_WORKERS:
+        _get_executor().submit(_work, image, scopes, post_id)
+    else:
+        run(image, scopes, post_id)
+
+
+def schedule(post):
+    """Ставит картинку поста в очередь на нарезку после коммита.
+
+    Повторная постановка той же картинки, пока она в очереди, ничего не
+    делает. При THUMBNAIL_WORKERS = 0 миниатюры режутся сразу.
+    """
+    if not post.image:
+        return
+    image = ImageFile(post.image.name, post.image.storage)
+    scopes = post_scopes(post)
+    post_id = post.pk
+    transaction.on_commit(lambda: _submit(image, scopes, post_id))
@@ -0,0 +1,314 @@
+"""Лента подписок: гибрид fan-out on write и fan-out on read.
+
+Пост обычного автора при публикации раскладывается в TimelineEntry
+каждого подписчика, и follow_index читает ленту одним диапазоном по индексу
+(user, -pub_date, -post). Посты крупных авторов (AuthorStats.pulled) не
+раскладываются: FollowFeed подмешивает их при чтении, сливая оба источника
+по дате публикации.
+
+Автор становится крупным, когда подписчиков больше
+TIMELINE_FANOUT_MAX_FOLLOWERS, а обратно возвращается, только когда их
+не больше TIMELINE_FANOUT_RESUME_FOLLOWERS: разрыв между порогами не даёт
+ему переключаться туда-обратно на каждой подписке. Возвращённого автора
+ленты подписчиков дозаполняются в фоне (refill).
+"""
+import copy
+import heapq
+import logging
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import Q
+
+from .bulk import chunked
+from .models import AuthorStats, Follow, Post, TimelineEntry
+from .paginator import keyset_filter, keyset_slice
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_lock = threading.Lock()
+
+ORDERING = ('-pub_date', '-post_id')
+POST_ORDERING = ('-pub_date', '-id')
+
+
+def entries_for(user):
+    return TimelineEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    )
+
+
+def is_pulled(author_id):
+    """Читают ли посты автора при выдаче ленты, а не раскладывают."""
+    return AuthorStats.objects.filter(
+        author_id=author_id, pulled=True
+    ).exists()
+
+
+def start_pulling(author_id):
+    """Переводит автора в чтение при выдаче, если подписчиков стало
+    больше TIMELINE_FANOUT_MAX_FOLLOWERS. Старые записи остаются в лентах:
+    FollowFeed их отбрасывает."""
+    AuthorStats.objects.filter(
+        author_id=author_id,
+        pulled=False,
+        followers_count__gt=settings.TIMELINE_FANOUT_MAX_FOLLOWERS,
+    ).update(pulled=True)
+
+
+def stop_pulling(author_id):
+    """Возвращает автора к раскладке, если подписчиков стало не больше
+    TIMELINE_FANOUT_RESUME_FOLLOWERS, и ставит дозаполнение лент в
+    очередь после коммита."""
+    resumed = AuthorStats.objects.filter(
+        author_id=author_id,
+        pulled=True,
+        followers_count__lte=settings.TIMELINE_FANOUT_RESUME_FOLLOWERS,
+    ).update(pulled=False)
+    if resumed:
+        transaction.on_commit(lambda: _submit(author_id))
+
+
+def _bulk_insert(entries):
+    # Пачки режем сами: bulk_create всё равно собирает весь генератор в
+    # список, а размер одного INSERT подберёт под ограничения базы.
+    entries = iter(entries)
+    while True:
+        batch = list(islice(entries, settings.TIMELINE_BATCH_SIZE))
+        if not batch:
+            return
+        TimelineEntry.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def due_for_trim():
+    """Пора ли срезать ленту читателя, получившего новую запись.
+
+    Срез стоит двух запросов, поэтому при раскладке он выполняется не на
+    каждую запись, а случайно, с вероятностью 1 / TIMELINE_TRIM_EVERY:
+    лента любого читателя срезается в среднем раз на столько полученных
+    записей и держится около TIMELINE_MAX_LENGTH, какими бы ни были id
+    читателя и постов.
+    """
+    return random.randrange(settings.TIMELINE_TRIM_EVERY) == 0
+
+
+def fan_out(post):
+    """Раскладывает новый пост в ленты подписчиков автора."""
+    if is_pulled(post.author_id):
+        return
+    followers = Follow.objects.filter(author_id=post.author_id).values_list(
+        'user_id', flat=True
+    ).iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+    for user_ids in chunked(followers, settings.TIMELINE_BATCH_SIZE):
+        TimelineEntry.objects.bulk_create(
+            [
+                TimelineEntry(
+                    user_id=user_id,
+                    post_id=post.pk,
+                    author_id=post.author_id,
+                    pub_date=post.pub_date,
+                ) for user_id in user_ids
+            ],
+            ignore_conflicts=True,
+        )
+        for user_id in user_ids:
+            if due_for_trim():
+                trim(user_id)
+
+
+def _latest_posts(author_id, **lookups):
+    return Post.objects.filter(author_id=author_id, **lookups).order_by(
+        '-pub_date', '-id'
+    ).values_list('pk', 'pub_date')[:settings.TIMELINE_MAX_LENGTH]
+
+
+def _fill(user_id, author_id, posts):
+    _bulk_insert(
+        TimelineEntry(
+            user_id=user_id,
+            post_id=post_id,
+            author_id=author_id,
+            pub_date=pub_date,
+        ) for post_id, pub_date in posts
+    )
+    trim(user_id)
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту читателя последние посты нового автора."""
+    if is_pulled(author_id):
+        return
+    _fill(user_id, author_id, _latest_posts(author_id))
+
+
+def _fill_followers(author_id, posts):
+    followers = Follow.objects.filter(author_id=author_id).values_list(
+        'user_id', flat=True
+    ).iterator(chunk_size=settings.TIMELINE_BATCH_SIZE)
+    for user_id in followers:
+        _fill(user_id, author_id, posts)
+
+
+def fan_out_since(author_id, since):
+    """Раскладывает посты автора не старше since по лентам подписчиков.
+
+    Для массовой загрузки, которая обходит сигналы: вместо fan_out на
+    каждый пост — одна выборка постов и одна вставка на подписчика.
+    """
+    if is_pulled(author_id):
+        return
+    _fill_followers(
+        author_id, list(_latest_posts(author_id, pub_date__gte=since))
+    )
+
+
+def refill(author_id):
+    """Раскладывает последние посты автора по лентам всех подписчиков.
+
+    Пока автор был крупным, его новые посты не раскладывались, а новые
+    подписки не заполнялись. Флаг pulled снимается до дозаполнения, так
+    что посты и подписки, появившиеся во время него, обрабатываются
+    обычным путём; ленты, до которых дозаполнение ещё не дошло, временно
+    видят только старые записи автора. Уже разложенные записи
+    пропускаются.
+    """
+    _fill_followers(author_id, list(_latest_posts(author_id)))
+
+
+def _work(author_id):
+    # Соединения с базой у потоков пула свои, Django их сам не закрывает.
+    try:
+        refill(author_id)
+    except Exception:
+        logger.exception('Не удалось дозаполнить ленты автора %s', author_id)
+    finally:
+        close_old_connections()
+
+
+def _get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.TIMELINE_WORKERS,
+                thread_name_prefix='timeline',
+            )
+        return _executor
+
+
+def _submit(author_id):
+    if settings.TIMELINE_WORKERS:
+        _get_executor().submit(_work, author_id)
+    else:
+        refill(author_id)
+
+
+def prune(user_id, author_id):
+    """Убирает из ленты читателя посты автора, от которого он отписался."""
+    TimelineEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def trim(user_id):
+    """Удаляет из ленты записи старше TIMELINE_MAX_LENGTH последних."""
+    last_kept = TimelineEntry.objects.filter(user_id=user_id).order_by(
+        *ORDERING
+    ).values_list(
+        'pub_date', 'post_id'
+    )[settings.TIMELINE_MAX_LENGTH - 1:settings.TIMELINE_MAX_LENGTH]
+    for pub_date, post_id in last_kept:
+        TimelineEntry.objects.filter(
+            Q(user_id=user_id)
+            & keyset_filter(ORDERING, [pub_date, post_id])
+        ).delete()
+
+
+class FollowFeed:
+    """Лента подписок читателя для пагинаторов.
+
+    Сливает k-путевым слиянием записи TimelineEntry (push) и посты
+    крупных авторов, выбранные напрямую из Post (pull). Поддерживает и
+    Paginator (count() и срезы), и CursorPaginator (keyset_slice).
+    values() даёт ту же ленту из словарей, как QuerySet.values().
+    """
+    model = Post
+    ordered = True
+    fields = None
+
+    def __init__(self, user):
+        pulled = list(
+            Follow.objects.filter(
+                user=user,
+                author__stats__pulled=True,
+            ).values_list('author_id', flat=True)
+        )
+        self.entries = entries_for(user)
+        self.pulled_posts = None
+        if pulled:
+            # Записи, разложенные до того, как автор стал крупным,
+            # отбрасываются, чтобы его посты не задвоились.
+            self.entries = self.entries.exclude(author_id__in=pulled)
+            self.pulled_posts = Post.objects.filter(
+                author_id__in=pulled
+            ).select_related('author', 'group')
+
+    def count(self):
+        total = self.entries.count()
+        if self.pulled_posts is not None:
+            total += self.pulled_posts.count()
+        return total
+
+    def __len__(self):
+        return self.count()
+
+    def values(self, *fields):
+        """Лента из словарей Post.values(*fields) без создания моделей.
+
+        Среди fields должны быть pub_date и id: по ним сливаются источники.
+        """
+        feed = copy.copy(self)
+        feed.fields = fields
+        return feed
+
+    def _entry_posts(self, entries):
+        if self.fields is None:
+            return (entry.post for entry in entries)
+        lookups = [f'post__{field}' for field in self.fields]
+        return (
+            dict(zip(self.fields, row))
+            for row in entries.values_list(*lookups)
+        )
+
+    def _sort_key(self, post):
+        if self.fields is None:
+            return post.pub_date, post.pk
+        return post['pub_date'], post['id']
+
+    def _sources(self, values, backwards, limit):
+        entries = keyset_slice(
+            self.entries, ORDERING, values, backwards, limit
+        )
+        yield self._entry_posts(entries)
+        if self.pulled_posts is not None:
+            posts = keyset_slice(
+                self.pulled_posts, POST_ORDERING, values, backwards, limit
+            )
+            yield posts if self.fields is None else posts.values(*self.fields)
+
+    def keyset_slice(self, ordering, values, backwards, limit):
+        merged = heapq.merge(
+            *self._sources(values, backwards, limit),
+            key=self._sort_key,
+            reverse=not backwards,
+        )
+        return islice(merged, limit)
+
+    def __getitem__(self, key):
+        if not isinstance(key, slice):
+            return list(self[key:key + 1])[0]
+        posts = self.keyset_slice(POST_ORDERING, None, False, key.stop)
+        return list(islice(posts, key.start, key.stop))
@@ -8,13 +8,22 @@ urlpatterns = [
     path('', views.index, name='index'),
     path('group/<slug:slug>/', views.group_posts, name='group'),
     path('profile/<str:username>/', views.profile, name='profile'),
+    path(
+        'profile/<str:username>/export/',
+        views.profile_export, name='profile_export',
+    ),
     path('posts/<int:post_id>/edit/', views.post_edit, name='post_edit'),
     path('posts/<int:post_id>/', views.post_detail, name='post_detail'),
     path('create/', views.post_create, name='post_create'),
+    path('search/', views.search, name='search'),
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment, name='add_comment',
     ),
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments, name='post_comments',
+    ),
     path('follow/', views.follow_index, name='follow_index'),
     path(
         'profile/<str:username>/follow/',
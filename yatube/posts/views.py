@@ -1,51 +1,136 @@
+from django.conf import settings
 from django.contrib.auth.models import AnonymousUser
 from django.contrib.auth.decorators import login_required
+from django.core.exceptions import PermissionDenied
+from django.db import transaction
+from django.db.models import OuterRef, Subquery
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404, redirect, render
+from django.views.decorators.http import condition
 
-from yatube.settings import NUMBER_OF_POSTS
+from . import cache, export, timeline
 from .forms import CommentForm, PostForm
-from .models import Follow, Group, Post, User
-from .paginator import paginator
+from .models import AuthorStats, Follow, Group, Post, User
+from .paginator import paginate, paginate_comments
+from .search import SearchPaginator
 
 
+def latest_changes():
+    """Даты последней публикации и последнего комментария на сайте.
+
+    Обе берутся первой строкой по индексам post_date_idx и
+    post_discussed_idx в одном запросе, без просмотра таблицы постов.
+    """
+    last_comment = Post.objects.filter(
+        last_comment_at__isnull=False
+    ).order_by('-last_comment_at').values('last_comment_at')[:1]
+    return Post.objects.order_by('-pub_date', '-id').annotate(
+        last_comment=Subquery(last_comment)
+    ).values_list('pub_date', 'last_comment').first() or (None, None)
+
+
+def last_post_date(**lookups):
+    """Дата последнего поста с полем, заданным lookups (автор или группа):
+    одна строка по составному индексу (поле, -pub_date, -id)."""
+    return Subquery(
+        Post.objects.filter(**lookups).order_by(
+            '-pub_date', '-id'
+        ).values('pub_date')[:1]
+    )
+
+
+def index_etag(request):
+    return cache.page_etag(
+        request, latest_changes(), cache.ALL_POSTS, cache.ALL_COMMENTS
+    )
+
+
+# В группе и профиле даты последнего комментария нет: комментарий
+# поднимает версии областей группы и автора, а они входят в ETag.
+def group_posts_etag(request, slug):
+    group = Group.objects.filter(slug=slug).annotate(
+        last_post=last_post_date(group=OuterRef('pk')),
+    ).values('pk', 'last_post').first()
+    if group is None:
+        return None
+    return cache.page_etag(
+        request, (group['last_post'],), cache.group_scope(group['pk']),
+    )
+
+
+def profile_etag(request, username):
+    author = User.objects.filter(username=username).annotate(
+        last_post=last_post_date(author=OuterRef('pk')),
+    ).values('pk', 'last_post').first()
+    if author is None:
+        return None
+    scopes = [cache.author_scope(author['pk'])]
+    if request.user.is_authenticated:
+        # Кнопка подписки зависит от подписок читателя.
+        scopes.append(cache.follow_scope(request.user.pk))
+    return cache.page_etag(request, (author['last_post'],), *scopes)
+
+
+def post_detail_etag(request, post_id):
+    post = Post.objects.filter(pk=post_id).values(
+        'pub_date', 'last_comment_at', 'author_id', 'group_id'
+    ).first()
+    if post is None:
+        return None
+    scopes = [cache.post_scope(post_id), cache.author_scope(post['author_id'])]
+    if post['group_id']:
+        scopes.append(cache.group_scope(post['group_id']))
+    return cache.page_etag(
+        request, (post['pub_date'], post['last_comment_at']), *scopes
+    )
+
+
+@condition(etag_func=index_etag)
 def index(request):
     template = 'posts/index.html'
     title = 'Последние записи'
     posts = Post.objects.select_related('author', 'group').all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(posts, NUMBER_OF_POSTS, page_number)
+    page_obj = paginate(request, posts, 'index')
+    scopes = [cache.ALL_POSTS, *cache.post_scopes(page_obj)]
+    cache.page_depends_on(request, *scopes)
     context = {
         'title': title,
         'page_obj': page_obj,
         'index': True,
+        'feed_cache': cache.feed_cache(request, 'index', *scopes),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=group_posts_etag)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
+    cache.page_depends_on(request, cache.group_scope(group.pk))
     template = 'posts/group_list.html'
     title = 'Записи сообщества'
     posts = group.posts.select_related('author', 'group').all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(posts, NUMBER_OF_POSTS, page_number)
+    page_obj = paginate(request, posts, 'group')
     context = {
         'title': title,
         'group': group,
         'page_obj': page_obj,
+        'feed_cache': cache.feed_cache(
+            request, 'group', cache.group_scope(group.pk)
+        ),
     }
     return render(request, template, context)
 
 
+@condition(etag_func=profile_etag)
 def profile(request, username):
     title = 'Профайл пользователя'
     template = 'posts/profile.html'
     following = False
     author = get_object_or_404(User, username=username)
+    cache.page_depends_on(request, cache.author_scope(author.pk))
     posts = author.posts.select_related('author', 'group').all()
-    page_number = request.GET.get('page')
-    page_obj = paginator(posts, NUMBER_OF_POSTS, page_number)
-    post_counter = posts.count()
+    page_obj = paginate(request, posts, 'profile')
+    post_counter = AuthorStats.posts_count_for(author)
     if (
         not isinstance(request.user, AnonymousUser)
         and Follow.objects.filter(user=request.user)
@@ -57,17 +142,54 @@ def profile(request, username):
         'page_obj': page_obj,
         'post_counter': post_counter,
         'following': following,
+        'feed_cache': cache.feed_cache(
+            request, 'profile', cache.author_scope(author.pk)
+        ),
     }
     return render(request, template, context)
 
 
+@login_required
+def profile_export(request, username):
+    """Выгружает все посты автора потоком JSONL или CSV (?format=csv),
+    по ?gzip=1 — сжатым файлом."""
+    author = get_object_or_404(User, username=username)
+    if author != request.user:
+        raise PermissionDenied
+    output_format = request.GET.get('format')
+    if output_format not in export.CONTENT_TYPES:
+        output_format = 'jsonl'
+    compress = bool(request.GET.get('gzip'))
+    filename = f'{author.username}-posts.{output_format}'
+    content_type = export.CONTENT_TYPES[output_format]
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(
+        export.stream(
+            'posts', output_format, author.posts.all(), compress=compress
+        ),
+        content_type=content_type,
+    )
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+@condition(etag_func=post_detail_etag)
 def post_detail(request, post_id):
     template = 'posts/post_detail.html'
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'), pk=post_id
+    )
+    scopes = [cache.post_scope(post.pk), cache.author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(cache.group_scope(post.group_id))
+    cache.page_depends_on(request, *scopes)
     form = CommentForm()
-    posts = post.author.posts.select_related('author', 'group').all()
-    post_counter = posts.count()
-    comments = post.comments.all()
+    post_counter = AuthorStats.posts_count_for(post.author)
+    comments = paginate_comments(
+        request, post.comments.select_related('author')
+    )
     context = {
         'post': post,
         'post_counter': post_counter,
@@ -77,6 +199,41 @@ def post_detail(request, post_id):
     return render(request, template, context)
 
 
+def post_comments(request, post_id):
+    template = 'posts/includes/comments.html'
+    post = get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    cache.page_depends_on(request, cache.post_scope(post.pk))
+    comments = paginate_comments(
+        request, post.comments.select_related('author')
+    )
+    context = {
+        'post': post,
+        'comments': comments,
+    }
+    return render(request, template, context)
+
+
+def search(request):
+    template = 'posts/search.html'
+    title = 'Поиск'
+    query = request.GET.get('q', '').strip()
+    page_obj = None
+    if query:
+        posts = Post.objects.select_related('author', 'group')
+        page_obj = SearchPaginator(
+            posts, settings.NUMBER_OF_POSTS, query
+        ).get_page(
+            after=request.GET.get('after'),
+            before=request.GET.get('before'),
+        )
+    context = {
+        'title': title,
+        'query': query,
+        'page_obj': page_obj,
+    }
+    return render(request, template, context)
+
+
 @login_required
 def post_create(request):
     template = 'posts/create_post.html'
@@ -85,7 +242,8 @@ def post_create(request):
     if form.is_valid():
         new_post = form.save(commit=False)
         new_post.author = request.user
-        new_post.save()
+        with transaction.atomic():
+            new_post.save()
         return redirect('posts:profile', request.user)
     context = {
         'form': form,
@@ -108,7 +266,9 @@ def post_edit(request, post_id):
         instance=post,
     )
     if form.is_valid():
-        form.save()
+        # Счётчики комментариев меняются в обход формы: не затираем их
+        # значениями, прочитанными до редактирования.
+        form.save(commit=False).save(update_fields=PostForm.Meta.fields)
         return redirect(redir_template, post_id=post_id)
     context = {
         'form': form,
@@ -127,7 +287,8 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect(redir_template, post_id=post_id)
 
 
@@ -135,15 +296,19 @@ def add_comment(request, post_id):
 def follow_index(request):
     template = 'posts/follow.html'
     title = 'Избранные авторы'
-    posts = Post.objects.select_related('author', 'group').filter(
-        author__following__user=request.user,
-    )
-    page_number = request.GET.get('page')
-    page_obj = paginator(posts, NUMBER_OF_POSTS, page_number)
+    posts = timeline.FollowFeed(request.user)
+    page_obj = paginate(request, posts, 'follow')
     context = {
         'title': title,
         'page_obj': page_obj,
         'following': True,
+        'feed_cache': cache.feed_cache(
+            request,
+            'follow',
+            cache.ALL_POSTS,
+            cache.follow_scope(request.user.pk),
+            *cache.post_scopes(page_obj),
+        ),
     }
     return render(request, template, context)
 
@@ -153,10 +318,11 @@ def profile_follow(request, username):
     author = get_object_or_404(User, username=username)
     user_fol = Follow.objects.filter(user=request.user, author=author)
     if request.user != author and not user_fol.exists():
-        Follow.objects.create(
-            user=request.user,
-            author=author,
-        )
+        with transaction.atomic():
+            Follow.objects.create(
+                user=request.user,
+                author=author,
+            )
     return redirect('posts:profile', author)
 
 
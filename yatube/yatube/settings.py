@@ -33,6 +33,7 @@ INSTALLED_APPS = [
     'posts.apps.PostsConfig',
     'users.apps.UsersConfig',
     'core.apps.CoreConfig',
+    'api.apps.ApiConfig',
     'sorl.thumbnail',
 ]
 
@@ -40,6 +41,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'posts.middleware.AnonymousPageCacheMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -119,6 +121,16 @@ STATIC_URL = '/static/'
 
 STATICFILES_DIR = os.path.join(BASE_DIR, 'static')
 STATICFILES_DIRS = (STATICFILES_DIR,)
+STATIC_ROOT = os.path.join(BASE_DIR, 'static_root')
+# collectstatic добавляет в имена хеш содержимого и кладёт рядом .gz и .br.
+STATICFILES_STORAGE = 'core.storage.CompressedManifestStaticFilesStorage'
+STATIC_PRECOMPRESS_EXTENSIONS = (
+    '.css', '.js', '.map', '.svg', '.html', '.txt', '.json', '.xml', '.ico',
+)
+STATIC_PRECOMPRESS_MIN_SIZE = 256
+# Хеш, который ManifestStaticFilesStorage вставляет перед расширением.
+STATIC_IMMUTABLE_PATTERN = r'\.[0-9a-f]{12}\.[^/]+$'
+STATIC_MAX_AGE = 60 * 60
 
 LOGIN_URL = 'users:login'
 LOGIN_REDIRECT_URL = 'posts:index'
@@ -127,14 +139,72 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 NUMBER_OF_POSTS = 10
+COMMENTS_PER_PAGE = 20
+
+# Ленты, которые листаются курсором (?after=/?before=) вместо номера
+# страницы: 'index', 'group', 'profile', 'follow'.
+CURSOR_PAGINATED_FEEDS = ()
+
+# Лента подписок: сколько последних постов хранится у читателя и каким
+# размером пачки раскладываются записи.
+TIMELINE_MAX_LENGTH = 1000
+TIMELINE_BATCH_SIZE = 1000
+# Раскладка срезает ленту читателя случайно, в среднем раз на столько
+# новых записей, поэтому лента обычно превышает TIMELINE_MAX_LENGTH на
+# десятки записей. sync_timelines --trim-only срезает все ленты точно.
+TIMELINE_TRIM_EVERY = 50
+# Посты авторов с большим числом подписчиков не раскладываются по лентам,
+# а подмешиваются при чтении.
+TIMELINE_FANOUT_MAX_FOLLOWERS = 10000
+# Обратно к раскладке автор возвращается, только когда подписчиков не
+# больше этого числа; ленты подписчиков дозаполняются в фоне
+# TIMELINE_WORKERS потоками (0 — сразу, в том же потоке).
+TIMELINE_FANOUT_RESUME_FOLLOWERS = 9000
+TIMELINE_WORKERS = 1
 
 CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Отдавать байты медиафайлов через фронт-прокси: 'X-Accel-Redirect' (nginx,
+# internal location с префиксом MEDIA_OFFLOAD_PREFIX) или 'X-Sendfile'.
+MEDIA_OFFLOAD_HEADER = None
+MEDIA_OFFLOAD_PREFIX = '/protected-media/'
+# Картинки постов, названные по хешу содержимого, не меняются никогда.
+MEDIA_IMMUTABLE_PATTERN = r'^posts/[0-9a-f]{2}/[0-9a-f]{64}'
+MEDIA_MAX_AGE = 24 * 60 * 60
 
 CACHES = {
     'default': {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
+
+# Фрагменты лент живут долго: при записи в Post, Group и Follow версии
+# их ключей поднимаются сигналами (см. posts/cache.py).
+FEED_CACHE_TIMEOUT = 60 * 60
+# Целые страницы для читателей без cookie сессии и CSRF.
+ANONYMOUS_PAGE_CACHE_TIMEOUT = 60 * 60
+# Отрисованные карточки постов, общие для всех лент.
+CARD_CACHE_TIMEOUT = 24 * 60 * 60
+# Начиная с этого числа строк админка берёт размер таблицы из статистики
+# базы, а не из COUNT(*).
+ADMIN_ESTIMATED_COUNT_MIN = 10000
+# Размеры миниатюр картинок постов: имя -> (геометрия, опции sorl).
+THUMBNAIL_PRESETS = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+# Потоки, нарезающие миниатюры в фоне; 0 — резать сразу после коммита.
+THUMBNAIL_WORKERS = 2
+# Записи sorl-thumbnail читаются из кеша Django через LRU в памяти процесса.
+THUMBNAIL_KVSTORE = 'posts.kvstore.KVStore'
+THUMBNAIL_LOCAL_CACHE_SIZE = 10000
+THUMBNAIL_LOCAL_CACHE_TIMEOUT = 5 * 60
+# Варианты картинок постов для srcset: ширины, пропорции, форматы.
+IMAGE_VARIANT_WIDTHS = (320, 640, 960, 1920)
+IMAGE_VARIANT_ASPECT = (960, 339)
+IMAGE_VARIANT_FORMATS = ('webp', 'jpg')
+IMAGE_VARIANT_QUALITY = 80
+IMAGE_VARIANT_SIZES = (
+    '(min-width: 1200px) 825px, (min-width: 768px) 75vw, 100vw'
+)